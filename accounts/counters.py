@@ -0,0 +1,90 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import transaction
+from notifications.models import Notification
+
+from friends.models import FriendRequest
+
+# Counters are counted again at least this often, in case a change was missed
+COUNTER_TIMEOUT = 60 * 60 * 24
+
+UNREAD_NOTIFICATIONS = 'unread_notifications'
+FRIEND_REQUESTS = 'friend_requests'
+
+
+def count_unread_notifications(user_id):
+    return Notification.objects.filter(recipient_id=user_id).unread().count()
+
+
+def count_friend_requests(user_id):
+    return FriendRequest.objects.filter(to_profile__user_id=user_id, status='p').count()
+
+
+# How each counter is counted from the database when it is not cached
+COUNTERS = {
+    UNREAD_NOTIFICATIONS: count_unread_notifications,
+    FRIEND_REQUESTS: count_friend_requests,
+}
+
+
+def counter_cache_key(name, user_id):
+    return f'counters:{name}:{user_id}'
+
+
+def get_count(name, user_id):
+    """
+    Return one of a user's counters, which are shown in the navbar on every page, from the cache.
+
+    Args:
+        name (str): The counter, UNREAD_NOTIFICATIONS or FRIEND_REQUESTS.
+        user_id (int): The id of the user.
+
+    Returns:
+        int: The count.
+    """
+    key = counter_cache_key(name, user_id)
+    count = cache.get(key)
+    if count is None:
+        count = COUNTERS[name](user_id)
+        cache.set(key, count, COUNTER_TIMEOUT)
+    return count
+
+
+def increment(name, user_ids):
+    """
+    Add one to a counter of each user, once for each time they appear in user_ids.
+    Counters which are not cached are left to be counted when they are next read.
+
+    Args:
+        name (str): The counter.
+        user_ids (Iterable[int]): The ids of the users.
+    """
+    for user_id, amount in Counter(user_ids).items():
+        try:
+            cache.incr(counter_cache_key(name, user_id), amount)
+        except ValueError:
+            pass
+
+
+def reset(name, user_id):
+    """
+    Set a counter of a user to 0, e.g. when they mark all their notifications as read.
+
+    Args:
+        name (str): The counter.
+        user_id (int): The id of the user.
+    """
+    cache.set(counter_cache_key(name, user_id), 0, COUNTER_TIMEOUT)
+
+
+def invalidate(name, user_ids):
+    """
+    Remove a counter of each user from the cache once the change is committed, so it is counted again.
+
+    Args:
+        name (str): The counter.
+        user_ids (Iterable[int]): The ids of the users.
+    """
+    keys = [counter_cache_key(name, user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: cache.delete_many(keys))
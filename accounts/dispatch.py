@@ -0,0 +1,110 @@
+from contextvars import ContextVar
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils import timezone
+from notifications.models import Notification
+
+from accounts import counters
+
+# Notifications committed during the current request, written together by NotificationMiddleware
+_buffer = ContextVar('notification_buffer', default=None)
+
+
+def notification(actor, recipients, verb, action_object=None, target=None, url=None):
+    """
+    Describe a notification to send with send_many.
+
+    Args:
+        actor (Model): Who or what the notification is from.
+        recipients (Iterable[int]): The ids of the users to notify. A QuerySet is only evaluated when the
+            notification is written, so it is not run at all if the transaction is rolled back.
+        verb (str): What the actor did, e.g. 'sent you a friend request.'.
+        action_object (Model): The object the actor acted on, optional.
+        target (Model): The object the action was done to, optional.
+        url (str): Where clicking the notification goes, optional.
+
+    Returns:
+        dict: The notification.
+    """
+    return {
+        'actor': actor, 'recipients': recipients, 'verb': verb, 'action_object': action_object, 'target': target,
+        'url': url, 'timestamp': timezone.now(),
+    }
+
+
+def send(actor, recipients, verb, action_object=None, target=None, url=None):
+    """
+    Send a notification to each recipient once the current transaction commits.
+    Takes the same arguments as notification.
+    """
+    send_many([notification(actor, recipients, verb, action_object, target, url)])
+
+
+def send_many(notifications):
+    """
+    Send notifications once the current transaction commits, replacing notify.send which saves one at a time.
+    During a request they are buffered and written with every other notification of the request,
+    otherwise they are written together as soon as the transaction commits.
+
+    Args:
+        notifications (list[dict]): The notifications, from notification.
+    """
+    def dispatch():
+        buffer = _buffer.get()
+        if buffer is None:
+            write(notifications)
+        else:
+            buffer.extend(notifications)
+
+    if notifications:
+        transaction.on_commit(dispatch)
+
+
+def write(notifications):
+    """
+    Save notifications with a single INSERT, and add them to their recipients' unread counters.
+
+    Args:
+        notifications (list[dict]): The notifications, from notification.
+
+    Returns:
+        list[Notification]: The saved notifications.
+    """
+    def content_type(obj):
+        return ContentType.objects.get_for_model(obj) if obj is not None else None
+
+    rows = []
+    for pending in notifications:
+        for recipient_id in pending['recipients']:
+            rows.append(Notification(
+                recipient_id=recipient_id, verb=pending['verb'], public=False, timestamp=pending['timestamp'],
+                actor_content_type=content_type(pending['actor']), actor_object_id=pending['actor'].pk,
+                action_object_content_type=content_type(pending['action_object']),
+                action_object_object_id=getattr(pending['action_object'], 'pk', None),
+                target_content_type=content_type(pending['target']),
+                target_object_id=getattr(pending['target'], 'pk', None),
+                data={'url': pending['url']} if pending['url'] is not None else None,
+            ))
+    rows = Notification.objects.bulk_create(rows)
+    counters.increment(counters.UNREAD_NOTIFICATIONS, [row.recipient_id for row in rows])
+    return rows
+
+
+class NotificationMiddleware:
+    """
+    Collect the notifications sent while handling a request and write them with one INSERT at the end of it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = _buffer.set([])
+        try:
+            return self.get_response(request)
+        finally:
+            notifications = _buffer.get()
+            _buffer.reset(token)
+            if notifications:
+                write(notifications)
@@ -1,6 +1,8 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
+from notifications.models import Notification
 
+from accounts import counters
 from accounts.models import User
 from friends.models import Profile, FriendRequest
 
@@ -14,3 +16,12 @@ def create_profile(sender, instance, created, **kwargs):
         # Send a friend request to the user from Sustainability Steve
         steve = User.objects.get(username='SusSteve')
         FriendRequest.objects.create(from_profile=steve.profile, to_profile=instance.profile, status='p')
+
+
+@receiver(post_save, sender=Notification)
+@receiver(post_delete, sender=Notification)
+def invalidate_unread_notifications(sender, instance, **kwargs):
+    """
+    Count a user's unread notifications again when one is saved, e.g. marked as read, or deleted.
+    """
+    counters.invalidate(counters.UNREAD_NOTIFICATIONS, [instance.recipient_id])
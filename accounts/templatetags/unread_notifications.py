@@ -0,0 +1,19 @@
+from django import template
+
+from accounts import counters
+
+register = template.Library()
+
+
+@register.simple_tag
+def get_unread_notifications(user):
+    """
+    Get the number of unread notifications using a django template tag, from the cache.
+
+    Args:
+        user (User): The user to search.
+
+    Returns:
+        int: Number of unread notifications.
+    """
+    return counters.get_count(counters.UNREAD_NOTIFICATIONS, user.pk)
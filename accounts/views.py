@@ -1 +1,37 @@
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.views import View
+from notifications import views as notifications_views
 
+from accounts import counters
+
+
+class MarkAllAsReadView(LoginRequiredMixin, View):
+    """
+    Mark all of the user's notifications as read, login required.
+    Replaces django-notifications' view, which updates them in bulk without sending post_save,
+    so that the user's unread counter is reset too.
+
+    Methods:
+        get(self, request): Mark all notifications as read and reset the unread counter.
+        post(self, request): The same as get, for the mark all as read form on the notifications page.
+    """
+
+    def get(self, request):
+        """
+        Mark all notifications as read and reset the unread counter.
+
+        Returns:
+            redirect: Redirects to the next parameter, or the unread notifications.
+        """
+        response = notifications_views.mark_all_as_read(request)
+        counters.reset(counters.UNREAD_NOTIFICATIONS, request.user.pk)
+        return response
+
+    def post(self, request):
+        """
+        The same as get, for the mark all as read form on the notifications page.
+
+        Returns:
+            redirect: Redirects to the next parameter, or the unread notifications.
+        """
+        return self.get(request)
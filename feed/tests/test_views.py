@@ -0,0 +1,164 @@
+import datetime
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from friends.tests.factories import ProfileFactory, FriendRequestFactory
+from tasks.models import TaskInstance
+from tasks.tests.factories import TaskInstanceFactory
+
+
+class FeedQuerySet(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = ProfileFactory.create()
+        cls.friend = ProfileFactory.create()
+        cls.stranger = ProfileFactory.create()
+        FriendRequestFactory.create(from_profile=cls.profile, to_profile=cls.friend, status='a')
+
+    def setUp(self):
+        # Friend ids cached by earlier tests may belong to profiles that have been rolled back
+        cache.clear()
+
+    def complete_task(self, profile, days_ago=0, status=TaskInstance.COMPLETED):
+        time = timezone.now() - datetime.timedelta(days=days_ago)
+        return TaskInstanceFactory.create(profile=profile, status=status, time_accepted=time, time_completed=time)
+
+    def test_feed_shows_own_and_friends_tasks(self):
+        """Verify that the feed only contains tasks completed by the user or their friends, newest first."""
+        own_task = self.complete_task(self.profile, days_ago=2)
+        friend_task = self.complete_task(self.friend, days_ago=1)
+        self.complete_task(self.stranger)
+        TaskInstanceFactory.create(profile=self.friend)
+
+        self.client.force_login(self.profile.user)
+        response = self.client.get(reverse('feed:feed'))
+
+        self.assertEqual(list(response.context['friend_tasks']), [friend_task, own_task])
+
+    def test_feed_query_count_is_independent_of_task_count(self):
+        """Verify that adding more tasks to the feed does not add more queries."""
+        self.client.force_login(self.profile.user)
+        self.complete_task(self.friend)
+        # The first request caches the user's friend ids
+        self.client.get(reverse('feed:feed'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('feed:feed'))
+
+        for i in range(5):
+            self.complete_task(self.friend)
+        with self.assertNumQueries(len(queries)):
+            self.client.get(reverse('feed:feed'))
+
+    def test_feed_annotates_likes_and_reports(self):
+        """Verify that each task in the feed is annotated with its likes and reports, and whether the user made them."""
+        task = self.complete_task(self.friend)
+        task.likes.add(self.profile, self.stranger)
+        task.reports.add(self.stranger)
+
+        self.client.force_login(self.profile.user)
+        feed_task = self.client.get(reverse('feed:feed')).context['friend_tasks'][0]
+
+        self.assertEqual((feed_task.like_count, feed_task.report_count), (2, 1))
+        self.assertTrue(feed_task.liked_by_me)
+        self.assertFalse(feed_task.reported_by_me)
+
+    def test_staff_feed_query_count_is_independent_of_reports(self):
+        """Verify that showing who reported each task does not add a query per task."""
+        self.profile.user.is_staff = True
+        self.profile.user.save()
+        self.client.force_login(self.profile.user)
+        self.complete_task(self.friend).reports.add(self.stranger)
+        self.client.get(reverse('feed:feed'))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('feed:feed'))
+
+        for i in range(5):
+            self.complete_task(self.friend).reports.add(self.stranger, self.profile)
+        with self.assertNumQueries(len(queries)):
+            response = self.client.get(reverse('feed:feed'))
+        self.assertContains(response, 'Reported by 2 users', count=5)
+
+
+class FeedPagination(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile = ProfileFactory.create()
+        time = timezone.now()
+        # Tasks completed at the same time must still be split between pages without being repeated or skipped
+        cls.tasks = [
+            TaskInstanceFactory.create(profile=cls.profile, status=TaskInstance.COMPLETED, time_accepted=time,
+                                       time_completed=time - datetime.timedelta(minutes=i // 2))
+            for i in range(25)
+        ]
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.profile.user)
+
+    def test_pages_cover_feed_once(self):
+        """Verify that following the cursors returns every task exactly once, in feed order."""
+        response = self.client.get(reverse('feed:feed'))
+        first_page = list(response.context['friend_tasks'])
+        self.assertEqual(len(first_page), 20)
+
+        response = self.client.get(reverse('feed:feed_more'), {'cursor': response.context['next_cursor']})
+        second_page = list(response.context['friend_tasks'])
+        self.assertEqual(len(second_page), 5)
+        self.assertIsNone(response.context['next_cursor'])
+        self.assertTemplateNotUsed(response, 'base.html')
+
+        expected = sorted(self.tasks, key=lambda task: (task.time_completed, task.pk), reverse=True)
+        self.assertEqual(first_page + second_page, expected)
+
+    def test_invalid_cursor(self):
+        """Verify that a malformed cursor is a 404 rather than a server error."""
+        response = self.client.get(reverse('feed:feed_more'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+
+class LikeAndReport(TestCase):
+
+    def setUp(self):
+        self.owner = ProfileFactory.create()
+        time = timezone.now()
+        self.task = TaskInstanceFactory.create(profile=self.owner, status=TaskInstance.PENDING_APPROVAL,
+                                               time_accepted=time, time_completed=time)
+
+    def like(self, profile):
+        self.client.force_login(profile.user)
+        return self.client.post(reverse('feed:like', args=[self.task.pk]), HTTP_ACCEPT='application/json')
+
+    def test_third_like_completes_task(self):
+        """Verify that a task pending approval is completed, and its points added, once, on the third like."""
+        points = self.owner.points
+        for count in range(1, 5):
+            response = self.like(ProfileFactory.create())
+            self.assertEqual(response.json()['likes'], count)
+
+        self.assertEqual(response.json()['status'], TaskInstance.COMPLETED)
+        self.task.refresh_from_db()
+        self.owner.refresh_from_db()
+        self.assertEqual(self.task.status, TaskInstance.COMPLETED)
+        self.assertEqual(self.owner.points, points + self.task.task.points)
+
+    def test_cannot_like_own_task(self):
+        """Verify that liking your own task is refused."""
+        response = self.like(self.owner)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.task.likes.count(), 0)
+
+    def test_report_json(self):
+        """Verify that reporting a task answers with JSON and adds it to the moderation queue."""
+        self.client.force_login(ProfileFactory.create().user)
+        response = self.client.post(reverse('feed:report', args=[self.task.pk]), HTTP_ACCEPT='application/json')
+
+        self.assertEqual(response.json(), {'reported': True})
+        self.task.refresh_from_db()
+        self.assertEqual(self.task.report_count, 1)
@@ -1,9 +1,11 @@
 from django.urls import path
 
 from feed.views import FeedView
+from feed.views import FeedPageView
 from feed.views import LikeTaskView
 from feed.views import ReportTaskView
 from feed.views import ReportedTasksView
+from feed.views import ReportedTasksPageView
 from feed.views import DeleteTaskView
 from feed.views import RestoreTaskView
 from feed.views import TaskDetailView  # Import the new class
@@ -12,11 +14,13 @@ from feed.views import CommentView
 app_name = "feed"
 urlpatterns = [
     path('', FeedView.as_view(), name='feed'),
+    path('more/', FeedPageView.as_view(), name='feed_more'),
     path('like/<int:pk>/', LikeTaskView.as_view(), name='like'),
     path('report/<int:pk>/', ReportTaskView.as_view(), name='report'),
 
     # Staff views
     path('reported/', ReportedTasksView.as_view(), name='reported'),
+    path('reported/more/', ReportedTasksPageView.as_view(), name='reported_more'),
     path('delete/<int:pk>/', DeleteTaskView.as_view(), name='delete'),
     path('restore/<int:pk>/', RestoreTaskView.as_view(), name='restore'),
     
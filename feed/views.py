@@ -6,6 +6,9 @@ from django.views.generic import ListView, UpdateView
 from django.views.generic import TemplateView
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.db.models import Q
+from django.http import Http404, JsonResponse
+from django.urls import reverse
 
 from .models import Comment
 from django.views import View
@@ -16,15 +19,105 @@ import re
 from better_profanity import profanity
 
 
-class FeedView(LoginRequiredMixin, ListView):
+# Cursors count microseconds from this point so that they can be compared exactly
+CURSOR_EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+def encode_cursor(task):
+    """
+    Encode the position of a task instance in a list ordered by time completed then id.
+
+    Args:
+        task (TaskInstance): The last task instance on a page.
+
+    Returns:
+        str: The cursor, in the form '<microseconds since epoch>_<id>'.
+    """
+    microseconds = (task.time_completed - CURSOR_EPOCH) // datetime.timedelta(microseconds=1)
+    return f'{microseconds}_{task.pk}'
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor made by encode_cursor.
+
+    Args:
+        cursor (str): The cursor to decode.
+
+    Returns:
+        tuple[datetime, int]: The time completed and id of the task instance the cursor points at.
+
+    Raises:
+        Http404: if the cursor is malformed.
+    """
+    try:
+        microseconds, pk = cursor.split('_')
+        return CURSOR_EPOCH + datetime.timedelta(microseconds=int(microseconds)), int(pk)
+    except (ValueError, OverflowError):
+        raise Http404('Invalid cursor')
+
+
+class CursorPaginationMixin:
+    """
+    Keyset pagination for lists of task instances ordered by time completed then id, most recent first.
+    Each page is found with an indexed range query after the cursor rather than an OFFSET, so the cost of a page does
+    not depend on how far down the list it is.
+
+    Attributes:
+        paginate_by (int): The number of task instances on each page.
+        load_more_url_name (str): The url returning the next page as an HTML fragment.
+
+    Methods:
+        paginate_queryset(self, queryset, page_size): Return the page after the cursor in the request.
+        get_context_data(self, **kwargs): Add the cursor and url for the next page.
+    """
+    paginate_by = 20
+    load_more_url_name = None
+    next_cursor = None
+
+    def paginate_queryset(self, queryset, page_size):
+        """
+        Return the page after the cursor in the request.
+
+        Returns:
+            tuple: No paginator or page object, the task instances on this page, and whether there is another page.
+        """
+        cursor = self.request.GET.get('cursor')
+        if cursor:
+            time_completed, pk = decode_cursor(cursor)
+            queryset = queryset.filter(Q(time_completed__lt=time_completed) | Q(time_completed=time_completed,
+                                                                                 id__lt=pk))
+
+        # Fetch one extra task instance to find out whether there is another page
+        tasks = list(queryset[:page_size + 1])
+        has_next = len(tasks) > page_size
+        tasks = tasks[:page_size]
+        self.next_cursor = encode_cursor(tasks[-1]) if has_next else None
+        return None, None, tasks, has_next
+
+    def get_context_data(self, **kwargs):
+        """
+        Add the cursor and url for the next page.
+
+        Returns:
+            context (dict[str, Any]): next_cursor, load_more_url.
+        """
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        context['load_more_url'] = reverse(self.load_more_url_name)
+        return context
+
+
+class FeedView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """
     View for the feed page, login required.
-    Shows all tasks that have been completed by the user or their friends.
+    Shows all tasks that have been completed by the user or their friends, one page at a time.
 
     Attributes:
         template_name (str): The html template this view uses.
         context_object_name (str): What this is called in the template.
         model (TaskInstance): What is being displayed.
+        load_more_url_name (str): The url returning the next page of the feed.
 
     Methods:
         get_queryset(self): Return pending and completed tasks of user's friends, most recent first.
@@ -32,31 +125,36 @@ class FeedView(LoginRequiredMixin, ListView):
     template_name = 'feed/feed.html'
     context_object_name = 'friend_tasks'
     model = TaskInstance
+    load_more_url_name = 'feed:feed_more'
 
     def get_queryset(self):
         """
         Return pending and completed tasks of user's friends, most recent first.
-        Tasks more than a week old are set to complete.
+        Tasks pending for more than a week are approved by the approve_tasks background job, not here.
 
         Returns:
-            tasks (TaskInstance): The tasks to be displayed.
+            tasks (QuerySet[TaskInstance]): The tasks to be displayed.
         """
-        # Exclude active tasks and exploded tasks
-        tasks = TaskInstance.objects.exclude(status=TaskInstance.ACTIVE).exclude(status=TaskInstance.EXPLODED)
-        # Only show tasks of the user or their friends.
-        tasks = [task for task in tasks if
-                 task.profile == self.request.user.profile or task.profile in self.request.user.profile.get_friends()]
-        # If a task was completed more than a week ago, its status is set to COMPLETED
-        for task in tasks:
-            if task.status == TaskInstance.PENDING_APPROVAL and datetime.datetime.now() > task.time_completed.replace(
-                    tzinfo=None) + datetime.timedelta(days=7):
-                task.status = TaskInstance.COMPLETED
-                task.save()
+        profile = self.request.user.profile
+
+        # Only show tasks of the user or their friends, excluding active tasks and exploded tasks
+        profile_ids = profile.get_friend_ids() | {profile.id}
+        tasks = TaskInstance.objects.filter(profile__in=profile_ids).exclude(
+            status__in=[TaskInstance.ACTIVE, TaskInstance.EXPLODED])
+
+        # Sort tasks by time completed, most recent first, and load everything the feed card displays
+        tasks = TaskInstance.annotate_feed(tasks, profile, reporters=self.request.user.is_staff)
+        return tasks.order_by('-time_completed', '-id')
 
-        # Sort tasks by time completed, most recent first
-        tasks.sort(key=lambda x: x.time_completed, reverse=True)
 
-        return tasks
+class FeedPageView(FeedView):
+    """
+    The next page of the feed as an HTML fragment, used by the 'load more' button.
+
+    Attributes:
+        template_name (str): The html template this view uses.
+    """
+    template_name = 'components/feed_page.html'
 
 
 class HomeView(TemplateView):
@@ -84,15 +182,29 @@ class HomeView(TemplateView):
         return super().get(request)
 
 
+def wants_json(request):
+    """
+    Check whether a request asked for JSON, as the feed's like and report buttons do, rather than a page.
+
+    Args:
+        request (HttpRequest): The request.
+
+    Returns:
+        bool: Whether the response should be JSON.
+    """
+    return 'application/json' in request.headers.get('Accept', '')
+
+
 class ReportTaskView(LoginRequiredMixin, UpdateView):
     """
     View for reporting a task.
     If the user is a staff member, the task is deleted.
     Otherwise, the task is reported and a staff member will review it.
+    Responds with JSON if it was asked for, otherwise redirects to the feed.
 
     Methods:
         get(self, request, pk): Redirect to the feed.
-        post(self, request, pk):
+        post(self, request, pk): Delete or report a task.
     """
 
     def get(self, request, pk):
@@ -110,16 +222,21 @@ class ReportTaskView(LoginRequiredMixin, UpdateView):
 
         Returns:
             redirect: Redirects to feed:feed.
+            JsonResponse: Whether the task was deleted or reported.
         """
         task = get_object_or_404(TaskInstance, pk=pk)
         if request.user.is_staff:
             task.delete()
-            messages.success(request, 'You deleted a task.')
+            message = 'You deleted a task.'
+            data = {'deleted': True}
         else:
-            task.reports.add(request.user.profile)
-            task.save()
-            messages.success(request, 'You reported a task.')
+            task.report(request.user.profile)
+            message = 'You reported a task.'
+            data = {'reported': True}
 
+        if wants_json(request):
+            return JsonResponse(data)
+        messages.success(request, message)
         return redirect('feed:feed')
 
 
@@ -127,6 +244,7 @@ class LikeTaskView(LoginRequiredMixin, UpdateView):
     """
     View for liking a task.
     If the task gets 3 likes, it is changed from 'pending approval' to 'completed'.
+    Responds with JSON if it was asked for, otherwise redirects to the feed.
 
     Methods:
         get(self, request, pk): Redirect to the feed.
@@ -148,41 +266,43 @@ class LikeTaskView(LoginRequiredMixin, UpdateView):
 
         Returns:
             redirect: Redirects to feed:feed.
+            JsonResponse: The number of likes, and the status of the task and its badge colour, or an error.
         """
-        task = get_object_or_404(TaskInstance, pk=pk)
-        if request.user.profile == task.profile:
+        task = get_object_or_404(TaskInstance.objects.select_related('task'), pk=pk)
+        if request.user.profile.pk == task.profile_id:
+            if wants_json(request):
+                return JsonResponse({'error': "You can't like your own task."}, status=400)
             messages.info(request, "You can't like your own task.")
             return redirect('feed:feed')
 
-        else:
-            task.likes.add(request.user.profile)
-            task.save()
-            if task.likes.count() >= 3:
-                task.status = TaskInstance.COMPLETED
-                task.save()
-            messages.success(request, 'You liked a task.')
-            return redirect('feed:feed')
+        likes = task.like(request.user.profile)
+        if wants_json(request):
+            return JsonResponse({'likes': likes, 'status': task.status, 'status_colour': task.status_colour})
+        messages.success(request, 'You liked a task.')
+        return redirect('feed:feed')
 
 
 # Staff views
 
-class ReportedTasksView(LoginRequiredMixin, ListView):
+class ReportedTasksView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     """
     View for the reported tasks page. Staff only.
-    Shows all tasks that have been reported by users.
+    Shows all tasks that have been reported by users, one page at a time.
 
     Attributes:
         template_name (str): The html template this view uses.
         context_object_name (str): What this is called in the template.
         model (TaskInstance): What is being displayed.
+        load_more_url_name (str): The url returning the next page of reported tasks.
 
     Methods:
           dispatch(self, request, *args, **kwargs): Redirect to the feed unless the user is staff
-          get_queryset(self):
+          get_queryset(self): Return reported tasks, most recent first.
     """
     template_name = 'feed/reported_tasks.html'
     context_object_name = 'reported_tasks'
     model = TaskInstance
+    load_more_url_name = 'feed:reported_more'
 
     # User must be a staff member to view reported tasks
     def dispatch(self, request, *args, **kwargs):
@@ -195,15 +315,24 @@ class ReportedTasksView(LoginRequiredMixin, ListView):
 
     def get_queryset(self):
         """
-        Return reported tasks.
+        Return reported tasks, most recent first.
 
         Returns:
-            tasks (TaskInstance): Tasks which have been reported.
+            tasks (QuerySet[TaskInstance]): Tasks which have been reported.
         """
-        tasks = TaskInstance.objects.all()
-        tasks = [task for task in tasks if task.reports.count() > 0]
+        tasks = TaskInstance.objects.filter(report_count__gt=0)
+        tasks = TaskInstance.annotate_feed(tasks, self.request.user.profile, reporters=True)
+        return tasks.order_by('-time_completed', '-id')
+
+
+class ReportedTasksPageView(ReportedTasksView):
+    """
+    The next page of reported tasks as an HTML fragment, used by the 'load more' button. Staff only.
 
-        return tasks
+    Attributes:
+        template_name (str): The html template this view uses.
+    """
+    template_name = 'components/feed_page.html'
 
 
 class DeleteTaskView(LoginRequiredMixin, UpdateView):
@@ -51,7 +51,9 @@ class UpdateProfileForm(forms.ModelForm):
         profile = super().save(commit=False)
         current_image = Profile.objects.get(user=self.instance.user).image
         if self.cleaned_data['image'] != current_image:
-            current_image.delete()
+            # The default image is shared by every new profile, so it is never deleted
+            if current_image.name != Profile._meta.get_field('image').default:
+                current_image.delete(save=False)
             profile.image.name = f'{profile.user.username}{os.path.splitext(self.cleaned_data["image"].name)[1]}'
         else:
             profile.image = current_image
@@ -0,0 +1,39 @@
+# Generated by Django 4.1.7 on 2026-10-17 18:56
+
+from django.db import migrations, models
+from django.db.models import Case, F, Sum, When
+
+
+def calculate_points(apps, schema_editor):
+    """
+    Set each profile's points from their completed tasks minus their exploded tasks.
+    """
+    Profile = apps.get_model('friends', 'Profile')
+    TaskInstance = apps.get_model('tasks', 'TaskInstance')
+
+    totals = TaskInstance.objects.values_list('profile').annotate(points=Sum(Case(
+        When(status='COMPLETED', then=F('task__points')),
+        When(status='EXPLODED', then=-F('task__points')),
+        default=0,
+    ))).order_by()
+
+    for profile_id, points in totals:
+        if points:
+            Profile.objects.filter(pk=profile_id).update(points=points)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0009_alter_profile_image'),
+        ('tasks', '0022_taskinstance_tagged_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='profile',
+            name='points',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(calculate_points, migrations.RunPython.noop),
+    ]
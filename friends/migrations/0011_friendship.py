@@ -0,0 +1,60 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:02
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_friendships(apps, schema_editor):
+    """
+    Create the friendship in each direction of every friend request.
+    Accepting a request used to also save a request the other way, so only the first request of each pair is kept.
+    """
+    FriendRequest = apps.get_model('friends', 'FriendRequest')
+    Friendship = apps.get_model('friends', 'Friendship')
+
+    pairs = set()
+    duplicate_ids = []
+    friendships = []
+    for request in FriendRequest.objects.order_by('id'):
+        pair = frozenset((request.from_profile_id, request.to_profile_id))
+        if pair in pairs:
+            duplicate_ids.append(request.id)
+            continue
+        pairs.add(pair)
+        friendships.append(Friendship(profile_id=request.from_profile_id, friend_id=request.to_profile_id,
+                                      request=request, status=request.status, sent=True))
+        friendships.append(Friendship(profile_id=request.to_profile_id, friend_id=request.from_profile_id,
+                                      request=request, status=request.status, sent=False))
+
+    FriendRequest.objects.filter(id__in=duplicate_ids).delete()
+    Friendship.objects.bulk_create(friendships, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('friends', '0010_profile_points'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Friendship',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('p', 'Pending'), ('a', 'Accepted')], default='p', max_length=1)),
+                ('sent', models.BooleanField()),
+                ('friend', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='friends.profile')),
+                ('profile', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friendships', to='friends.profile')),
+                ('request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='friendships', to='friends.friendrequest')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='friendship',
+            index=models.Index(fields=['profile', 'status', 'friend'], name='friendship_profile_status_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='friendship',
+            unique_together={('profile', 'friend')},
+        ),
+        migrations.RunPython(create_friendships, migrations.RunPython.noop),
+    ]
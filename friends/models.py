@@ -1,7 +1,11 @@
-from django.db import models, IntegrityError
-from django.db.models import Q
+from django.core.cache import cache
+from django.db import models, transaction, IntegrityError
 
 from accounts.models import User
+from tasks.images import delete_variants
+
+# Cached friend ids are removed whenever a friend request changes, this only limits how long unused ids are kept
+FRIEND_IDS_TIMEOUT = 60 * 60 * 24
 
 
 class Profile(models.Model):
@@ -13,24 +17,66 @@ class Profile(models.Model):
         image (ImageField): The profile picture.
         friends (Profile): The user's friends.
         bio (TextField): The biography.
+        points (IntegerField): Points from completed tasks minus points from exploded tasks.
+            Kept up to date by TaskInstance, and can be rebuilt with manage.py rebuildpoints.
 
     Methods:
-        get_friends(self, status, id): Returns a list of friends.
+        friend_ids_query(self, status): Return a query of the ids of friends.
+        get_friend_ids(self, status): Return the ids of friends as a set.
+        clear_friend_ids(self): Forget the remembered ids of friends.
+        invalidate_friend_ids(cls, profile_ids): Remove the cached friend ids of these profiles.
+        get_friends(self, status): Returns a list of friends.
         get_friends_and_requested_friends(self): Return current friends and requested friends.
         name(self): If the user has a preferred name, return that. Otherwise, return their username.
+        save(self, *args, **kwargs): Save all but the points, then generate the variants of a new profile image.
     """
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     # single profile image
     image = models.ImageField(default='profile_pics/default.jpg', upload_to='profile_pics')
     friends = models.ManyToManyField('self', blank=True, symmetrical=True, through='FriendRequest')
     bio = models.TextField(default='', blank=True)
+    points = models.IntegerField(default=0)
+
+    # The name of the image this profile was loaded from the database with, used to process only new images
+    _loaded_image = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image = instance.__dict__.get('image') or None
+        return instance
 
     def __str__(self):
         return f'{self.user.username}'
 
-    def get_friends(self, status='a'):
+    def save(self, *args, **kwargs):
+        """
+        Save, then generate the variants of a new profile image in the background once it is saved.
+        Points are only saved when asked for in update_fields, as they are kept up to date with UPDATEs
+        and the points this profile was loaded with may have changed since.
+        """
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'points']
+        # Uploaded images replace the old image under the same name, so the name alone does not show a new image
+        uploaded = bool(self.image) and not self.image._committed
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            image_name = self.image.name
+            default = self._meta.get_field('image').default
+            # Delete the variants of a replaced image, so they are not left behind or shown in place of a new image
+            # uploaded under the same name, but never those of the default image every new profile shares
+            if self._loaded_image and self._loaded_image != default and (uploaded or image_name != self._loaded_image):
+                storage, replaced = self.image.storage, self._loaded_image
+                transaction.on_commit(lambda: delete_variants(storage, replaced))
+            if uploaded or image_name and image_name != self._loaded_image and image_name != default:
+                from friends.tasks import process_profile_image
+                transaction.on_commit(lambda: process_profile_image.delay(self.pk, image_name))
+        self._loaded_image = self.image.name
+
+    def friend_ids_query(self, status='a'):
         """
-        Returns a list of friends.
+        Return a query of the ids of friends.
         Request status is specified by the status parameter:
         a = accepted
         p = pending
@@ -40,21 +86,73 @@ class Profile(models.Model):
             status (str): The type of relationship, accepted, pending, or both.
 
         Returns:
-            friends (list): All friends with the appropriate status.
+            QuerySet[int]: The profile ids of all friends with the appropriate status, without duplicates.
         """
+        friend_ids = Friendship.objects.filter(profile=self).values_list('friend_id', flat=True)
         if status != 'all':
-            friends = [
-                request.to_profile if (request.from_profile == self) else request.from_profile 
-                for request in FriendRequest.objects.filter(Q(from_profile=self) | Q(to_profile=self), status=status)
-                ]
-        else:
-            friends = [
-                request.to_profile if (request.from_profile == self) else request.from_profile 
-                for request in FriendRequest.objects.filter(Q(from_profile=self) | Q(to_profile=self))
-                ]
-
-        return list(set(friends))
-    
+            friend_ids = friend_ids.filter(status=status)
+        return friend_ids
+
+    @staticmethod
+    def friend_ids_cache_key(profile_id, status):
+        return f'friends:ids:{profile_id}:{status}'
+
+    def get_friend_ids(self, status='a'):
+        """
+        Return the ids of friends as a set, for checking whether a profile is a friend.
+        Accepted and pending ids are kept in the cache until one of the profile's friend requests changes,
+        and are remembered on this profile, so repeated checks in the same request do not use the cache again.
+
+        Args:
+            status (str): The type of relationship, accepted 'a', pending 'p', or both 'all'.
+
+        Returns:
+            set[int]: The profile ids of all friends with the appropriate status.
+        """
+        if status == 'all':
+            return self.get_friend_ids('a') | self.get_friend_ids('p')
+
+        if not hasattr(self, '_friend_ids'):
+            self._friend_ids = {}
+        if status not in self._friend_ids:
+            key = self.friend_ids_cache_key(self.pk, status)
+            friend_ids = cache.get(key)
+            if friend_ids is None:
+                friend_ids = set(self.friend_ids_query(status))
+                cache.set(key, friend_ids, FRIEND_IDS_TIMEOUT)
+            self._friend_ids[status] = friend_ids
+        return self._friend_ids[status]
+
+    def clear_friend_ids(self):
+        """
+        Forget the remembered ids of friends, after a friend request changes.
+        """
+        self.__dict__.pop('_friend_ids', None)
+
+    @classmethod
+    def invalidate_friend_ids(cls, profile_ids):
+        """
+        Remove the cached friend ids of these profiles.
+
+        Args:
+            profile_ids (Iterable[int]): The ids of the profiles.
+        """
+        cache.delete_many([cls.friend_ids_cache_key(profile_id, status)
+                           for profile_id in profile_ids for status in ('a', 'p')])
+
+    def get_friends(self, status='a'):
+        """
+        Returns a list of friends, with their users.
+        Only one query is made once the friend ids are cached.
+
+        Args:
+            status (str): The type of relationship, accepted 'a', pending 'p', or both 'all'.
+
+        Returns:
+            friends (list[Profile]): All friends with the appropriate status.
+        """
+        return list(Profile.objects.filter(id__in=self.get_friend_ids(status)).select_related('user'))
+
     def get_friends_and_requested_friends(self):
         """
         Return profiles of current friends and incoming and outgoing requests.
@@ -68,17 +166,13 @@ class Profile(models.Model):
         in_pending_friends = []
         out_pending_friends = []
 
-        for request in FriendRequest.objects.filter(Q(from_profile=self) | Q(to_profile=self)):
-            if request.status == 'a':
-                if request.to_profile != self:
-                    accepted_friends.append(request.to_profile)
-                else:
-                    accepted_friends.append(request.from_profile)
+        for friendship in self.friendships.select_related('friend__user'):
+            if friendship.status == 'a':
+                accepted_friends.append(friendship.friend)
+            elif friendship.sent:
+                out_pending_friends.append(friendship.friend)
             else:
-                if request.to_profile == self:
-                    in_pending_friends.append(request.from_profile)
-                else:
-                    out_pending_friends.append(request.to_profile)
+                in_pending_friends.append(friendship.friend)
 
         dict_of_friends = {'a': accepted_friends, 'in_p': in_pending_friends, 'out_p': out_pending_friends}
         return dict_of_friends
@@ -109,7 +203,8 @@ class FriendRequest(models.Model):
         decline(self): Decline the friend request.
         cancel(self): Cancel the friend request.
         clean(self): Raise errors if trying to friend self or if request has been sent the other way.
-        save(self, *args, **kwargs): Clean self and save.
+        save(self, *args, **kwargs): Clean self and save, along with the friendship in each direction.
+        sync_friendships(self): Create or update the friendship in each direction to match this request.
     """
     STATUS_CHOICES = (
         ('p', 'Pending'),
@@ -133,20 +228,20 @@ class FriendRequest(models.Model):
         """
         self.status = 'a'
         self.save()
-        self.to_profile.friends.add(self.from_profile, through_defaults={'status': 'a'})
-        self.from_profile.friends.add(self.to_profile, through_defaults={'status': 'a'})
+        self.to_profile.clear_friend_ids()
+        self.from_profile.clear_friend_ids()
 
     def decline(self):
         """
         Decline the friend request.
-        The request is deleted.
+        The request and its friendships are deleted.
         """
         self.delete()
 
     def cancel(self):
         """
         Cancel the friend request.
-        The request is deleted.
+        The request and its friendships are deleted.
         """
         self.delete()
 
@@ -168,7 +263,53 @@ class FriendRequest(models.Model):
         
     def save(self,*args,**kwargs):
         """
-        Clean self and save.
+        Clean self and save, along with the friendship in each direction.
         """
         self.full_clean()
-        super().save(*args,**kwargs)
+        with transaction.atomic():
+            super().save(*args,**kwargs)
+            self.sync_friendships()
+
+    def sync_friendships(self):
+        """
+        Create or update the friendship in each direction to match this request.
+        """
+        Friendship.objects.bulk_create(
+            [
+                Friendship(profile_id=self.from_profile_id, friend_id=self.to_profile_id, request=self,
+                           status=self.status, sent=True),
+                Friendship(profile_id=self.to_profile_id, friend_id=self.from_profile_id, request=self,
+                           status=self.status, sent=False),
+            ],
+            update_conflicts=True,
+            unique_fields=['profile', 'friend'],
+            update_fields=['request', 'status', 'sent'],
+        )
+
+
+class Friendship(models.Model):
+    """
+    One direction of a friend request, so that each profile's friends can be found from one index.
+    There are two friendships for every friend request, which are deleted with the request.
+
+    Attributes:
+        profile (Profile): The profile whose friend this is.
+        friend (Profile): The friend.
+        request (FriendRequest): The friend request between the two profiles.
+        status (CharField): 'p' pending or 'a' accepted, the same as the request.
+        sent (BooleanField): True if the profile sent the request, False if they received it.
+    """
+    profile = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='friendships')
+    friend = models.ForeignKey(Profile, on_delete=models.CASCADE, related_name='+')
+    request = models.ForeignKey(FriendRequest, on_delete=models.CASCADE, related_name='friendships')
+    status = models.CharField(max_length=1, choices=FriendRequest.STATUS_CHOICES, default='p')
+    sent = models.BooleanField()
+
+    class Meta:
+        unique_together = ('profile', 'friend')
+        indexes = [
+            models.Index(fields=['profile', 'status', 'friend'], name='friendship_profile_status_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.profile} -> {self.friend}: {self.status}'
@@ -1,20 +1,43 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.urls import reverse
-from notifications.signals import notify
 
-from friends.models import FriendRequest
+from accounts import counters, dispatch
+from friends.models import FriendRequest, Profile
 
 
 @receiver(post_save, sender=FriendRequest)
 def send_friend_request_notification(sender, instance, created, **kwargs):
     """
     Notify the user when they have received a friend request or when their request has been accepted.
+    Remove the cached friend ids of both profiles, and the recipient's count of friend requests.
     """
+    invalidate_friend_caches(instance)
+
     if created:
-        notify.send(instance.from_profile, recipient=instance.to_profile.user, verb='sent you a friend request.',
-                    action_object=instance, target=instance.to_profile, url=reverse('friends:list'), public=False)
-        
+        dispatch.send(instance.from_profile, [instance.to_profile.user_id], 'sent you a friend request.',
+                      action_object=instance, target=instance.to_profile, url=reverse('friends:list'))
+
     if not created and instance.status == 'a':
-        notify.send(instance.to_profile, recipient=instance.from_profile.user, verb='accepted your friend request.',
-                    action_object=instance, target=instance.from_profile, url=reverse('friends:list'), public=False)
\ No newline at end of file
+        dispatch.send(instance.to_profile, [instance.from_profile.user_id], 'accepted your friend request.',
+                      action_object=instance, target=instance.from_profile, url=reverse('friends:list'))
+
+
+@receiver(post_delete, sender=FriendRequest)
+def remove_friend_request(sender, instance, **kwargs):
+    """
+    Remove the cached friend ids of both profiles, and the recipient's count of friend requests,
+    when a friend request is declined, cancelled or removed.
+    """
+    invalidate_friend_caches(instance)
+
+
+def invalidate_friend_caches(friend_request):
+    """
+    Remove the cached friend ids of both profiles of a friend request once the change is committed,
+    and the recipient's count of friend requests.
+    """
+    profile_ids = [friend_request.from_profile_id, friend_request.to_profile_id]
+    transaction.on_commit(lambda: Profile.invalidate_friend_ids(profile_ids))
+    counters.invalidate(counters.FRIEND_REQUESTS, [friend_request.to_profile.user_id])
@@ -0,0 +1,29 @@
+from celery import shared_task
+
+from friends.models import Profile
+from tasks.images import generate_variants
+
+# The variants shown as avatars and on profile pages
+PROFILE_IMAGE_VARIANTS = ['thumbnail', 'card']
+
+
+@shared_task(name="process_profile_image")
+def process_profile_image(profile_id, image_name):
+    """
+    Celery task to generate the thumbnail and card variants of a profile's new image,
+    which is queued when a new image is saved.
+    The image is skipped if it has been replaced since.
+
+    Args:
+        profile_id (int): The id of the profile.
+        image_name (str): The name of the image when it was saved.
+
+    Returns:
+        bool: Whether the image was processed.
+    """
+    profile = Profile.objects.filter(pk=profile_id).only('image').first()
+    if profile is None or profile.image.name != image_name:
+        return False
+
+    generate_variants(profile.image, PROFILE_IMAGE_VARIANTS)
+    return True
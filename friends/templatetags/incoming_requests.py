@@ -1,5 +1,6 @@
 from django import template
-from friends.models import FriendRequest
+
+from accounts import counters
 
 register = template.Library()
 
@@ -7,7 +8,7 @@ register = template.Library()
 @register.simple_tag
 def get_friend_requests(user):
     """
-    Get the total number of incoming friend requests using a django template tag.
+    Get the total number of incoming friend requests using a django template tag, from the cache.
 
     Args:
         user (User): The user to search.
@@ -15,6 +16,5 @@ def get_friend_requests(user):
     Returns:
         int: Number of incoming friend requests.
     """
-    friend_requests = FriendRequest.objects.filter(to_profile=user, status='p').values_list(
-            'from_profile_id', flat=True)
-    return friend_requests.count()
+    return counters.get_count(counters.FRIEND_REQUESTS, user.pk)
+
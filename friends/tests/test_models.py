@@ -1,6 +1,9 @@
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.test import TestCase
+from django.urls import reverse
 
+from accounts import counters
 from friends.models import *
 from friends.tests.factories import ProfileFactory, FriendRequestFactory
 
@@ -47,6 +50,9 @@ class FriendRequestIntegrity(TestCase):
 
 class FriendRequestFunctions(TestCase):
 
+    def setUp(self):
+        cache.clear()
+
     def test_accept(self):
         profile_instance1 = ProfileFactory()
         profile_instance2 = ProfileFactory()
@@ -111,3 +117,120 @@ class UserReferenceProfileIntegrity(TestCase):
         # tests to see if user has been deleted
         user = User.objects.filter(id=profile.id).first()
         self.assertIsNone(user)
+
+
+class FriendGraph(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.profile = ProfileFactory()
+        self.friend = ProfileFactory()
+        self.requested = ProfileFactory()
+        FriendRequestFactory(from_profile=self.friend, to_profile=self.profile).accept()
+        FriendRequestFactory(from_profile=self.profile, to_profile=self.requested)
+
+    def test_friend_ids(self):
+        self.assertEqual(self.profile.get_friend_ids(), {self.friend.id})
+        self.assertEqual(self.profile.get_friend_ids('p'), {self.requested.id})
+        self.assertEqual(self.profile.get_friend_ids('all'), {self.friend.id, self.requested.id})
+
+    def test_friend_ids_remembered(self):
+        self.profile.get_friend_ids()
+        with self.assertNumQueries(0):
+            self.assertIn(self.friend.id, self.profile.get_friend_ids())
+
+    def test_get_friends_single_query(self):
+        self.profile.get_friend_ids('all')
+        with self.assertNumQueries(1):
+            friends = self.profile.get_friends('all')
+            usernames = {friend.user.username for friend in friends}
+        self.assertEqual(usernames, {self.friend.user.username, self.requested.user.username})
+
+    def test_friend_ids_cached(self):
+        self.profile.get_friend_ids()
+        profile = Profile.objects.get(pk=self.profile.pk)
+        with self.assertNumQueries(0):
+            self.assertEqual(profile.get_friend_ids(), {self.friend.id})
+
+    def test_accept_invalidates_friend_ids(self):
+        request = FriendRequestFactory(from_profile=ProfileFactory(), to_profile=self.profile)
+        self.assertNotIn(request.from_profile_id, self.profile.get_friend_ids())
+        with self.captureOnCommitCallbacks(execute=True):
+            request.to_profile = self.profile
+            request.accept()
+        self.assertIn(request.from_profile_id, self.profile.get_friend_ids())
+        self.assertIn(self.profile.id, Profile.objects.get(pk=request.from_profile_id).get_friend_ids())
+
+    def test_delete_invalidates_friend_ids(self):
+        self.profile.get_friend_ids('p')
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendRequest.objects.filter(to_profile=self.requested).delete()
+        self.assertEqual(Profile.objects.get(pk=self.profile.pk).get_friend_ids('p'), set())
+
+
+class FriendshipSync(TestCase):
+
+    def setUp(self):
+        self.from_profile = ProfileFactory()
+        self.to_profile = ProfileFactory()
+        self.request = FriendRequestFactory(from_profile=self.from_profile, to_profile=self.to_profile)
+
+    def test_request_creates_friendships(self):
+        friendships = Friendship.objects.values_list('profile', 'friend', 'status', 'sent')
+        self.assertCountEqual(friendships, [
+            (self.from_profile.id, self.to_profile.id, 'p', True),
+            (self.to_profile.id, self.from_profile.id, 'p', False),
+        ])
+
+    def test_accept_updates_friendships(self):
+        self.request.accept()
+        self.assertEqual(set(Friendship.objects.values_list('status', flat=True)), {'a'})
+        # Accepting no longer saves a second request the other way
+        self.assertEqual(FriendRequest.objects.count(), 1)
+
+    def test_decline_deletes_friendships(self):
+        self.request.decline()
+        self.assertFalse(Friendship.objects.exists())
+
+
+class NavbarCounters(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.profile = ProfileFactory.create()
+        self.user_id = self.profile.user.pk
+
+    def test_friend_requests_counted_once(self):
+        """Verify that the friend request count is cached, and counted again when a request arrives."""
+        self.assertEqual(counters.get_count(counters.FRIEND_REQUESTS, self.user_id), 0)
+        with self.assertNumQueries(0):
+            counters.get_count(counters.FRIEND_REQUESTS, self.user_id)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendRequestFactory.create(to_profile=self.profile)
+        self.assertEqual(counters.get_count(counters.FRIEND_REQUESTS, self.user_id), 1)
+
+    def test_unread_notifications_follow_sends_and_mark_all_as_read(self):
+        """Verify that sent notifications add to the cached unread count and marking all as read resets it."""
+        self.assertEqual(counters.get_count(counters.UNREAD_NOTIFICATIONS, self.user_id), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendRequestFactory.create(to_profile=self.profile)
+        with self.assertNumQueries(0):
+            self.assertEqual(counters.get_count(counters.UNREAD_NOTIFICATIONS, self.user_id), 1)
+
+        self.client.force_login(self.profile.user)
+        self.client.get(reverse('mark_all_as_read'))
+        self.assertFalse(self.profile.user.notifications.unread().exists())
+        self.assertEqual(counters.get_count(counters.UNREAD_NOTIFICATIONS, self.user_id), 0)
+
+    def test_mark_all_as_read_form_posts(self):
+        """Verify that the notifications page's mark all as read form, which POSTs, marks them read."""
+        with self.captureOnCommitCallbacks(execute=True):
+            FriendRequestFactory.create(to_profile=self.profile)
+        self.assertEqual(counters.get_count(counters.UNREAD_NOTIFICATIONS, self.user_id), 1)
+
+        self.client.force_login(self.profile.user)
+        response = self.client.post(reverse('notifications:mark_all_as_read'))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(self.profile.user.notifications.unread().exists())
+        self.assertEqual(counters.get_count(counters.UNREAD_NOTIFICATIONS, self.user_id), 0)
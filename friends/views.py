@@ -15,7 +15,6 @@ from accounts.models import User
 from friends.forms import UpdateProfileForm
 from friends.models import FriendRequest, Profile
 from leagues.models import League
-from tasks.models import TaskInstance
 
 
 class ProfileView(LoginRequiredMixin, DetailView):
@@ -62,9 +61,9 @@ class ProfileView(LoginRequiredMixin, DetailView):
         if context['other_user']:
             non_mutual_friends = []
             mutual_friends = []
-            users_friends = self.request.user.profile.get_friends()
+            users_friend_ids = self.request.user.profile.get_friend_ids()
             for friend in friends:
-                if friend in users_friends:
+                if friend.id in users_friend_ids:
                     # if the friend is mutual
                     mutual_friends.append(friend)
                 else:
@@ -78,16 +77,7 @@ class ProfileView(LoginRequiredMixin, DetailView):
         context['profile'] = profile
         context['leagues'] = League.objects.filter(leaguemember__profile=profile, leaguemember__status='joined')
 
-        # Calculates the total points of the user
-        points = 0
-        for task in TaskInstance.objects.filter(profile=profile, status=TaskInstance.COMPLETED):
-            points += task.task.points
-
-        # Subtract exploded tasks
-        for task in TaskInstance.objects.filter(profile=profile, status=TaskInstance.EXPLODED):
-            points -= task.task.points
-
-        context['points'] = points
+        context['points'] = profile.points
 
         return context
 
@@ -260,7 +250,7 @@ class AddFriendView(LoginRequiredMixin, View):
         profile = get_object_or_404(Profile, user__username=request.POST['username'])
 
         # Check if the user is already a friend
-        if profile in request.user.profile.friends.all():
+        if profile.id in request.user.profile.get_friend_ids():
             messages.error(request, 'You are already friends with this user.')
             return redirect('friends:list')
 
@@ -451,10 +441,10 @@ class ProfileSearchView(ListView):
 
         if f:
             # adds friends and potential friends to exclusion list
-            friend_ids = [
-                friend.id for friend in self.request.user.profile.get_friends(status='all')
-            ]
-            exclusions.extend(friend_ids)
+            friend_user_ids = Profile.objects.filter(
+                id__in=self.request.user.profile.friend_ids_query(status='all')
+            ).values_list('user_id', flat=True)
+            exclusions.extend(friend_user_ids)
 
         if len(query_tokens) == 0:
             # if there are no tokens then there are no search results
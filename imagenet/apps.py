@@ -1,10 +1,4 @@
 from django.apps import AppConfig
-from transformers import ConvNextForImageClassification, ConvNextImageProcessor
-
-
-print("Loading AI...")
-model = ConvNextForImageClassification.from_pretrained("facebook/convnext-base-224")
-feature_extractor = ConvNextImageProcessor.from_pretrained("facebook/convnext-base-224")
 
 
 class ImagenetConfig(AppConfig):
@@ -0,0 +1,200 @@
+import threading
+
+from django.conf import settings
+from PIL import Image, ImageOps
+
+MODEL_NAME = "facebook/convnext-base-224"
+INPUT_SIZE = (224, 224)
+
+# The backend is loaded on first use rather than when the app is imported,
+# so only the process which classifies photos pays for loading it
+_lock = threading.Lock()
+_backend = None
+
+
+class TorchBackend:
+    """
+    Classifies images with the PyTorch model, optionally with its linear layers quantized to int8.
+
+    Attributes:
+        feature_extractor (ConvNextImageProcessor): Normalises images for the model.
+        model (ConvNextForImageClassification): The model.
+        id2label (dict[int, str]): Maps each label id to its ImageNet label.
+
+    Methods:
+        predict(self, images): Return the label id of each image.
+    """
+
+    def __init__(self, quantized=False):
+        import torch
+        from transformers import ConvNextForImageClassification, ConvNextImageProcessor
+
+        self.feature_extractor = ConvNextImageProcessor.from_pretrained(MODEL_NAME)
+        model = ConvNextForImageClassification.from_pretrained(MODEL_NAME)
+        model.eval()
+        if quantized:
+            # Most of ConvNeXt's time is spent in the linear layers of each block, which int8 speeds up on CPUs
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.model = model
+        self.id2label = model.config.id2label
+
+    def predict(self, images):
+        """
+        Return the label id of each image, in one forward pass.
+
+        Args:
+            images (list[Image]): The images, prepared with prepare_image.
+
+        Returns:
+            list[int]: The label id of each image.
+        """
+        import torch
+
+        inputs = self.feature_extractor(images, return_tensors="pt")
+        with torch.no_grad():
+            logits = self.model(**inputs).logits
+        return logits.argmax(-1).tolist()
+
+
+class OnnxBackend:
+    """
+    Classifies images with the model exported to ONNX by manage.py exportonnx, using ONNX Runtime.
+
+    Attributes:
+        feature_extractor (ConvNextImageProcessor): Normalises images for the model.
+        session (InferenceSession): The ONNX Runtime session running the model.
+        id2label (dict[int, str]): Maps each label id to its ImageNet label.
+
+    Methods:
+        predict(self, images): Return the label id of each image.
+    """
+
+    def __init__(self, path):
+        import onnxruntime
+        from transformers import AutoConfig, ConvNextImageProcessor
+
+        self.feature_extractor = ConvNextImageProcessor.from_pretrained(MODEL_NAME)
+        self.session = onnxruntime.InferenceSession(str(path), providers=['CPUExecutionProvider'])
+        self.id2label = AutoConfig.from_pretrained(MODEL_NAME).id2label
+
+    def predict(self, images):
+        """
+        Return the label id of each image, in one run of the session.
+
+        Args:
+            images (list[Image]): The images, prepared with prepare_image.
+
+        Returns:
+            list[int]: The label id of each image.
+        """
+        inputs = self.feature_extractor(images, return_tensors="np")
+        logits = self.session.run(['logits'], {'pixel_values': inputs['pixel_values']})[0]
+        return logits.argmax(-1).tolist()
+
+
+def load_backend(name):
+    """
+    Load a backend.
+
+    Args:
+        name (str): 'pytorch', 'quantized' for PyTorch with int8 linear layers, or 'onnx' for ONNX Runtime.
+
+    Returns:
+        TorchBackend | OnnxBackend: The loaded backend.
+    """
+    if name == 'pytorch':
+        return TorchBackend()
+    if name == 'quantized':
+        return TorchBackend(quantized=True)
+    if name == 'onnx':
+        return OnnxBackend(settings.AI_ONNX_PATH)
+    raise ValueError(f"Unknown AI backend '{name}', expected 'pytorch', 'quantized' or 'onnx'")
+
+
+def get_backend():
+    """
+    Return the backend chosen by the AI_BACKEND setting, loading it the first time this is called.
+    Safe to call from several threads at once, the backend is only loaded once.
+
+    Returns:
+        TorchBackend | OnnxBackend: The loaded backend.
+    """
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                print(f"Loading AI ({settings.AI_BACKEND})...")
+                _backend = load_backend(settings.AI_BACKEND)
+    return _backend
+
+
+def prepare_image(img):
+    """
+    Return an image as the model expects it, the centre square upright and resized to 224x224.
+
+    Args:
+        img (Image): The image.
+
+    Returns:
+        Image: The prepared image.
+    """
+    img = ImageOps.exif_transpose(img).convert('RGB')
+
+    # crop the largest square from the centre of the image
+    size = min(img.size)
+    left = (img.width - size) // 2
+    upper = (img.height - size) // 2
+    return img.crop((left, upper, left + size, upper + size)).resize(INPUT_SIZE)
+
+
+def predict(images):
+    """
+    Return the label id of each image, in one batch.
+
+    Args:
+        images (list[Image]): The images, prepared with prepare_image.
+
+    Returns:
+        list[int]: The label id of each image.
+    """
+    return get_backend().predict(images)
+
+
+def get_label(label_id):
+    """
+    Return the ImageNet label of a label id.
+
+    Args:
+        label_id (int): The label id.
+
+    Returns:
+        str: The label, e.g. 'coffee mug'.
+    """
+    return get_backend().id2label[label_id]
+
+
+def export_onnx(path):
+    """
+    Export the PyTorch model to ONNX, for the onnx backend.
+
+    Args:
+        path (str): Where to save the model.
+    """
+    import torch
+
+    backend = TorchBackend()
+    # Return the logits as a tuple rather than a ModelOutput, which ONNX cannot export
+    backend.model.config.return_dict = False
+    torch.onnx.export(
+        backend.model, torch.zeros(1, 3, *INPUT_SIZE), str(path),
+        input_names=['pixel_values'], output_names=['logits'],
+        dynamic_axes={'pixel_values': {0: 'batch'}, 'logits': {0: 'batch'}},
+        opset_version=14,
+    )
+
+
+def warm_up():
+    """
+    Load the backend and run it once, so the first photo classified is not slowed down by loading.
+    """
+    predict([Image.new('RGB', INPUT_SIZE)])
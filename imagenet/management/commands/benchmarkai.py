@@ -0,0 +1,82 @@
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from imagenet.classifier import load_backend, prepare_image
+from imagenet.models import AutoCompleteRule
+from imagenet.tasks import BATCH_SIZE
+
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp'}
+
+
+class Command(BaseCommand):
+    """
+    A command that can be run from the console via manage.py to compare the speed and accuracy of the AI backends.
+    Every backend classifies the same folder of images, e.g. task photos of mugs, cups, bikes, buses and other things,
+    and its labels are compared with those of the first backend, the unoptimised PyTorch model by default.
+
+    Attributes:
+        help:   The help message given by the console for this command
+
+    Methods:
+        add_arguments(self, parser):   Add the directory argument and the --backends and --batch-size options
+        handle(self):   The code run by calling this command
+    """
+    help = 'Compares the latency and accuracy of the AI backends on a folder of images'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Folder of images to classify')
+        parser.add_argument('--backends', nargs='+', default=['pytorch', 'quantized', 'onnx'],
+                            help='Backends to compare, the first is the reference for accuracy')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                            help='Number of images classified in each forward pass')
+
+    def handle(self, *args, **options):
+        """
+        The code run by calling this command.
+
+        Reports, for each backend, the time to classify each image, how many of its labels are the same as the
+        reference backend's, and how many of its decisions about which tasks a photo completes are the same.
+        """
+        paths = sorted(path for path in Path(options['directory']).iterdir()
+                       if path.suffix.lower() in IMAGE_EXTENSIONS)
+        if not paths:
+            self.stderr.write(f"No images found in {options['directory']}")
+            return
+
+        images = []
+        for path in paths:
+            with Image.open(path) as img:
+                images.append(prepare_image(img))
+        batch_size = options['batch_size']
+        batches = [images[i:i + batch_size] for i in range(0, len(images), batch_size)]
+
+        rules = AutoCompleteRule.get_rules()
+        reference = None
+        for name in options['backends']:
+            try:
+                backend = load_backend(name)
+            except (ImportError, OSError) as error:
+                self.stderr.write(f"Skipping {name}: {error}")
+                continue
+
+            # The first forward pass is slower while the backend initialises
+            backend.predict(images[:1])
+            start = time.perf_counter()
+            labels = [backend.id2label[label_id] for batch in batches for label_id in backend.predict(batch)]
+            elapsed = time.perf_counter() - start
+
+            decisions = [{task_id for task_id, rule_labels in rules.items() if label in rule_labels}
+                         for label in labels]
+            if reference is None:
+                reference = name, labels, decisions
+            same_labels = sum(a == b for a, b in zip(labels, reference[1]))
+            same_decisions = sum(a == b for a, b in zip(decisions, reference[2]))
+
+            self.stdout.write(
+                f"{name}: {elapsed / len(images) * 1000:.1f} ms/image, "
+                f"{same_labels}/{len(images)} labels and {same_decisions}/{len(images)} decisions "
+                f"the same as {reference[0]}"
+            )
@@ -0,0 +1,29 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from imagenet.classifier import export_onnx
+
+
+class Command(BaseCommand):
+    """
+    A command that can be run from the console via manage.py to export the model to ONNX, for AI_BACKEND=onnx.
+
+    Attributes:
+        help:   The help message given by the console for this command
+
+    Methods:
+        add_arguments(self, parser):   Add the optional path argument
+        handle(self):   The code run by calling this command
+    """
+    help = 'Exports the model to ONNX, for the onnx AI backend'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?', default=settings.AI_ONNX_PATH,
+                            help='Where to save the model, AI_ONNX_PATH by default')
+
+    def handle(self, *args, **options):
+        """
+        The code run by calling this command.
+        """
+        export_onnx(options['path'])
+        self.stdout.write(f"Exported the model to {options['path']}")
@@ -0,0 +1,53 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:11
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The rules which were previously hard coded, by words in the task's title
+COFFEE_LABELS = ['coffee mug', 'cup', 'espresso']
+COMMUTING_LABELS = [
+    'mountain bike, all-terrain bike, off-roader',
+    'school bus',
+    'trolleybus, trolley coach, trackless trolley',
+    'minibus',
+]
+
+
+def create_rules(apps, schema_editor):
+    """
+    Create rules for the coffee, caffeine and commuting tasks which the AI already completed.
+    """
+    Task = apps.get_model('tasks', 'Task')
+    AutoCompleteRule = apps.get_model('imagenet', 'AutoCompleteRule')
+
+    rules = []
+    for task in Task.objects.all():
+        title = task.title.lower()
+        labels = []
+        if 'coffee' in title or 'caffeine' in title:
+            labels += COFFEE_LABELS
+        if 'commuting' in title:
+            labels += COMMUTING_LABELS
+        if labels:
+            rules.append(AutoCompleteRule(task=task, labels='\n'.join(labels)))
+    AutoCompleteRule.objects.bulk_create(rules)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0022_taskinstance_tagged_by'),
+        ('imagenet', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AutoCompleteRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('labels', models.TextField(help_text='ImageNet labels which complete the task, one per line')),
+                ('task', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='ai_rule', to='tasks.task')),
+            ],
+        ),
+        migrations.RunPython(create_rules, migrations.RunPython.noop),
+    ]
@@ -1,3 +1,136 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
 from django.db import models
+from django.utils import timezone
+
+from tasks.models import Task
+
+RULES_CACHE_KEY = 'imagenet:rules'
+
+
+class Prediction(models.Model):
+    """
+    A photo the AI has already classified, so identical photos are never classified twice.
+    Photos are identified by a hash of the 224x224 image the model sees, so the same photo uploaded again matches
+    even if it is saved under a different name or with different metadata.
+    Only the AI_PREDICTION_CACHE_SIZE most recently used predictions are kept.
+
+    Attributes:
+        image_hash (CharField): SHA-256 of the backend's name and the prepared image's pixels.
+        label_id (IntegerField): The id of the predicted ImageNet label.
+        label (CharField): The predicted ImageNet label.
+        last_used (DateTimeField): When this prediction was last made or looked up.
+
+    Methods:
+        hash_image(cls, backend_name, img): Return the hash identifying a prepared image.
+        get_cached(cls, image_hashes): Return the cached label ids of these hashes, marking them as used.
+        evict(cls): Delete the least recently used predictions beyond the cache size.
+    """
+    image_hash = models.CharField(max_length=64, unique=True)
+    label_id = models.IntegerField()
+    label = models.CharField(max_length=200)
+    last_used = models.DateTimeField(default=timezone.now, db_index=True)
+
+    def __str__(self):
+        return f'{self.image_hash[:12]}: {self.label}'
+
+    @classmethod
+    def hash_image(cls, backend_name, img):
+        """
+        Return the hash identifying a prepared image.
+        Different backends can predict different labels, so the backend's name is part of the hash.
+
+        Args:
+            backend_name (str): The AI backend, e.g. 'pytorch'.
+            img (Image): The image, prepared with imagenet.classifier.prepare_image.
+
+        Returns:
+            str: The hex digest.
+        """
+        digest = hashlib.sha256(backend_name.encode())
+        digest.update(img.tobytes())
+        return digest.hexdigest()
+
+    @classmethod
+    def get_cached(cls, image_hashes):
+        """
+        Return the cached label ids of these hashes, marking them as used.
+
+        Args:
+            image_hashes (Iterable[str]): The hashes to look up.
+
+        Returns:
+            dict[str, int]: Maps each cached hash to its label id. Hashes which are not cached are left out.
+        """
+        cached = dict(cls.objects.filter(image_hash__in=image_hashes).values_list('image_hash', 'label_id'))
+        if cached:
+            cls.objects.filter(image_hash__in=cached).update(last_used=timezone.now())
+        return cached
+
+    @classmethod
+    def evict(cls):
+        """
+        Delete the least recently used predictions beyond AI_PREDICTION_CACHE_SIZE.
+
+        Returns:
+            int: The number of predictions deleted.
+        """
+        size = settings.AI_PREDICTION_CACHE_SIZE
+        cutoff = list(cls.objects.order_by('-last_used').values_list('last_used', flat=True)[size:size + 1])
+        if not cutoff:
+            return 0
+        return cls.objects.filter(last_used__lte=cutoff[0]).delete()[0]
+
+
+class AutoCompleteRule(models.Model):
+    """
+    The ImageNet labels which complete a task automatically when the AI sees one of them in the task's photo.
+    Tasks without a rule are never classified.
+
+    Attributes:
+        task (Task): The task.
+        labels (TextField): The ImageNet labels which complete the task, one per line, e.g. 'coffee mug'.
+
+    Methods:
+        get_labels(self): Return the labels as a list.
+        get_rules(cls): Return the labels which complete each task, from the cache.
+        invalidate_rules(cls): Remove the cached rules.
+    """
+    task = models.OneToOneField(Task, on_delete=models.CASCADE, related_name='ai_rule')
+    labels = models.TextField(help_text='ImageNet labels which complete the task, one per line')
+
+    def __str__(self):
+        return f'{self.task}: {", ".join(self.get_labels())}'
+
+    def get_labels(self):
+        """
+        Return the labels as a list.
+
+        Returns:
+            list[str]: The labels, without blank lines.
+        """
+        return [label.strip() for label in self.labels.splitlines() if label.strip()]
+
+    @classmethod
+    def get_rules(cls):
+        """
+        Return the labels which complete each task.
+        The rules are cached until one changes, so checking whether a task has a rule does not query the database.
+
+        Returns:
+            dict[int, frozenset[str]]: Maps the id of each task with a rule to its labels.
+        """
+        rules = cache.get(RULES_CACHE_KEY)
+        if rules is None:
+            rules = {rule.task_id: frozenset(rule.get_labels()) for rule in cls.objects.all()}
+            cache.set(RULES_CACHE_KEY, rules, None)
+        return rules
 
-# Create your models here.
+    @classmethod
+    def invalidate_rules(cls):
+        """
+        Remove the cached rules, after a rule changes.
+        """
+        cache.delete(RULES_CACHE_KEY)
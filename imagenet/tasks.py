@@ -0,0 +1,132 @@
+from celery import shared_task
+from celery.signals import worker_ready
+from django.conf import settings
+from django.core.cache import cache
+from PIL import Image
+
+from imagenet.classifier import get_backend, get_label, predict, prepare_image, warm_up
+from imagenet.models import AutoCompleteRule, Prediction
+from tasks.models import TaskInstance
+
+# How many photos are classified in each forward pass
+BATCH_SIZE = 16
+
+# Only one worker classifies photos at a time, the lock expires in case that worker dies
+LOCK_KEY = 'imagenet:classifying'
+LOCK_TIMEOUT = 60 * 10
+
+
+def get_rule_label_ids():
+    """
+    Return the ids of the labels which complete each task with a rule.
+
+    Returns:
+        dict[int, frozenset[int]]: Maps the id of each task with a rule to the ids of its labels.
+    """
+    label2id = {label: label_id for label_id, label in get_backend().id2label.items()}
+    return {task_id: frozenset(label2id[label] for label in labels if label in label2id)
+            for task_id, labels in AutoCompleteRule.get_rules().items()}
+
+
+def get_pending():
+    """
+    Return task instances with a photo which has not been classified yet, for tasks with a rule.
+
+    Returns:
+        QuerySet[TaskInstance]: The task instances waiting to be classified, oldest first.
+    """
+    return TaskInstance.objects.filter(task__in=list(AutoCompleteRule.get_rules()), ai_tag__isnull=True) \
+        .exclude(photo='').exclude(photo__isnull=True).exclude(status=TaskInstance.COMPLETED).order_by('pk')
+
+
+def load_image(task_instance):
+    """
+    Open a task instance's photo as the model expects it.
+
+    Args:
+        task_instance (TaskInstance): The task instance.
+
+    Returns:
+        Image: The prepared photo, or None if it cannot be read.
+    """
+    try:
+        with Image.open(task_instance.photo.path) as img:
+            return prepare_image(img)
+    except OSError:
+        return None
+
+
+def classify_batch(task_instances):
+    """
+    Classify the photos of a batch of task instances in one forward pass, then save every tag,
+    and complete the tasks whose photo matches, in bulk.
+    Photos which have been classified before are looked up instead.
+    Photos which cannot be read are tagged with an empty string so they are not tried again.
+
+    Args:
+        task_instances (list[TaskInstance]): The task instances to classify.
+    """
+    images = {task_instance.pk: load_image(task_instance) for task_instance in task_instances}
+    hashes = {pk: Prediction.hash_image(settings.AI_BACKEND, img) for pk, img in images.items() if img is not None}
+
+    # Only classify photos which have not been classified before
+    cached = Prediction.get_cached(hashes.values())
+    uncached = list({image_hash: pk for pk, image_hash in hashes.items() if image_hash not in cached}.items())
+    if uncached:
+        predicted = predict([images[pk] for image_hash, pk in uncached])
+        cached.update((image_hash, label_id) for (image_hash, pk), label_id in zip(uncached, predicted))
+        Prediction.objects.bulk_create([
+            Prediction(image_hash=image_hash, label_id=label_id, label=get_label(label_id))
+            for (image_hash, pk), label_id in zip(uncached, predicted)
+        ], ignore_conflicts=True)
+    label_ids = {pk: cached[image_hash] for pk, image_hash in hashes.items()}
+
+    rule_label_ids = get_rule_label_ids()
+    completed = []
+    for task_instance in task_instances:
+        label_id = label_ids.get(task_instance.pk)
+        # Save the tag even if it does not match so that it is not run again
+        task_instance.ai_tag = get_label(label_id)[:50] if label_id is not None else ''
+        if label_id in rule_label_ids.get(task_instance.task_id, ()):
+            completed.append(task_instance.pk)
+
+    TaskInstance.objects.bulk_update(task_instances, ['ai_tag'])
+    TaskInstance.bulk_set_status(TaskInstance.objects.filter(pk__in=completed), TaskInstance.COMPLETED)
+
+
+@shared_task(name="classify_photos")
+def classify_photos():
+    """
+    Celery task to classify every photo waiting to be classified in batches of BATCH_SIZE, which is queued when
+    a photo is saved for a task with an AutoCompleteRule.
+    It is routed to the imagenet queue, so only the AI worker, which has the model loaded, runs it.
+    If another worker is already classifying, this returns straight away and that worker picks up the new photos.
+
+    Returns:
+        int: The number of photos classified.
+    """
+    classified = 0
+    # Check again after releasing the lock, in case a photo arrived while another task was waiting for it
+    while get_pending().exists():
+        if not cache.add(LOCK_KEY, True, LOCK_TIMEOUT):
+            break
+        try:
+            while batch := list(get_pending()[:BATCH_SIZE]):
+                classify_batch(batch)
+                classified += len(batch)
+            Prediction.evict()
+        finally:
+            cache.delete(LOCK_KEY)
+
+    print(f"Classified {classified} photo(s)")
+    return classified
+
+
+@worker_ready.connect
+def warm_up_worker(sender, **kwargs):
+    """
+    Load the model as soon as a worker which consumes the imagenet queue starts, rather than on the first photo.
+    Other workers, web processes and management commands never load it.
+    """
+    if 'imagenet' in {queue.name for queue in sender.task_consumer.queues}:
+        warm_up()
@@ -1,3 +1,64 @@
-from django.test import TestCase
+import datetime
+from unittest import skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from tasks.tests.factories import TaskFactory
+
+# The imagenet app is only installed when AI is enabled
+if settings.AI:
+    from imagenet.models import AutoCompleteRule, Prediction
+
+
+@skipUnless(settings.AI, 'AI is not enabled')
+class PredictionCache(TestCase):
+
+    def test_hash_depends_on_pixels_and_backend(self):
+        """Verify that identical images share a hash, unless they were classified by different backends."""
+        black = Image.new('RGB', (224, 224))
+        white = Image.new('RGB', (224, 224), 'white')
+        self.assertEqual(Prediction.hash_image('pytorch', black), Prediction.hash_image('pytorch', black.copy()))
+        self.assertNotEqual(Prediction.hash_image('pytorch', black), Prediction.hash_image('pytorch', white))
+        self.assertNotEqual(Prediction.hash_image('pytorch', black), Prediction.hash_image('onnx', black))
+
+    def test_get_cached_marks_used(self):
+        """Verify that looking up a prediction returns its label id and moves it to the front of the cache."""
+        old = timezone.now() - datetime.timedelta(days=1)
+        Prediction.objects.create(image_hash='a', label_id=504, label='coffee mug', last_used=old)
+
+        self.assertEqual(Prediction.get_cached(['a', 'b']), {'a': 504})
+        self.assertGreater(Prediction.objects.get(image_hash='a').last_used, old)
+
+    @override_settings(AI_PREDICTION_CACHE_SIZE=2)
+    def test_evict_least_recently_used(self):
+        """Verify that only the most recently used predictions are kept."""
+        now = timezone.now()
+        for hours, image_hash in enumerate(['newest', 'newer', 'older', 'oldest']):
+            Prediction.objects.create(image_hash=image_hash, label_id=0, label='tench',
+                                      last_used=now - datetime.timedelta(hours=hours))
+
+        self.assertEqual(Prediction.evict(), 2)
+        self.assertCountEqual(Prediction.objects.values_list('image_hash', flat=True), ['newest', 'newer'])
+
+
+@skipUnless(settings.AI, 'AI is not enabled')
+class AutoCompleteRules(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.task = TaskFactory()
+
+    def test_rules_cached_until_changed(self):
+        """Verify that the rules are read from the cache, and read again after a rule is saved."""
+        self.assertEqual(AutoCompleteRule.get_rules(), {})
+        with self.captureOnCommitCallbacks(execute=True):
+            AutoCompleteRule.objects.create(task=self.task, labels='tin can\n\n beer bottle ')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(AutoCompleteRule.get_rules(), {self.task.pk: frozenset(['tin can', 'beer bottle'])})
+        with self.assertNumQueries(0):
+            AutoCompleteRule.get_rules()
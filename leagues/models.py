@@ -1,10 +1,16 @@
 from django.contrib import messages
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
 from django.db import models
+from django.db.models import F, Window
+from django.db.models.functions import Rank
 from django.urls import reverse
 
 from tasks.models import TaskInstance
 
+# Cached leaderboards are removed whenever they change, this only limits how stale points changed outside Django can be
+LEADERBOARD_TIMEOUT = 60 * 60
+
 
 class League(models.Model):
     """
@@ -22,7 +28,10 @@ class League(models.Model):
         get_members(self): Return league members.
         get_invited_members(self): Return invited users.
         get_pending_members(self): Return pending members.
-        get_ranked_members(self): Return members in order of number of points.
+        get_ranked_members(self, limit, offset): Return members in order of number of points.
+        get_leaderboard(self): Return the profile id and points of each member in order of points, using the cache.
+        get_leaderboard_members(self, limit, offset): Return members in order of number of points, using the cache.
+        invalidate_leaderboards(cls, league_ids): Remove the cached leaderboards of these leagues.
         get_admins(self): Return league administrators.
         add_admin(self, profile): Add a user as an admin of the league.
         join(self, request, profile): Join the league as a member.
@@ -87,16 +96,88 @@ class League(models.Model):
         """
         return self.leaguemember_set.filter(status='pending')
 
-    def get_ranked_members(self):
+    def get_ranked_members(self, limit=None, offset=0):
         """
         Return members in order of number of points.
+        Points are summed from the members' completed and exploded tasks and ranked in a single query.
+        Members with the same points share a rank, and are listed in order of username.
+
+        Args:
+            limit (int): The maximum number of members to return, or None to return every member after the offset.
+            offset (int): The number of higher ranked members to skip.
+
+        Returns:
+            QuerySet[LeagueMember]: The set of this league's LeagueMembers in order of points,
+                annotated with their points and rank.
+        """
+        members = self.leaguemember_set.filter(status='joined').select_related('profile__user').annotate(
+            points=TaskInstance.points_sum('profile__taskinstance__'),
+        ).annotate(
+            rank=Window(Rank(), order_by=F('points').desc()),
+        ).order_by('-points', 'profile__user__username', 'pk')
+
+        if limit is None:
+            return members[offset:]
+        return members[offset:offset + limit]
+
+    @staticmethod
+    def leaderboard_cache_key(league_id):
+        return f'leagues:leaderboard:{league_id}'
+
+    def get_leaderboard(self):
+        """
+        Return the profile id and points of each member in order of points.
+        The leaderboard is cached until a member's points change or a member joins or leaves the league.
+
+        Returns:
+            list[tuple[int, int]]: The profile id and points of each member, in the order of get_ranked_members.
+        """
+        key = self.leaderboard_cache_key(self.pk)
+        leaderboard = cache.get(key)
+        if leaderboard is None:
+            leaderboard = list(self.get_ranked_members().values_list('profile_id', 'points'))
+            cache.set(key, leaderboard, LEADERBOARD_TIMEOUT)
+        return leaderboard
+
+    def get_leaderboard_members(self, limit=None, offset=0):
+        """
+        Return members in order of number of points, ranked from the cached leaderboard.
+
+        Args:
+            limit (int): The maximum number of members to return, or None to return every member after the offset.
+            offset (int): The number of higher ranked members to skip.
 
         Returns:
-            QuerySet[LeagueMember]: The set of this league's LeagueMembers in order of points.
+            list[LeagueMember]: This league's LeagueMembers in order of points, with their points and rank set.
+        """
+        # Members with the same points share a rank
+        ranked = []
+        for position, (profile_id, points) in enumerate(self.get_leaderboard(), start=1):
+            rank = ranked[-1][2] if ranked and ranked[-1][1] == points else position
+            ranked.append((profile_id, points, rank))
+        ranked = ranked[offset:] if limit is None else ranked[offset:offset + limit]
+
+        members = self.leaguemember_set.filter(status='joined', profile_id__in=[entry[0] for entry in ranked])
+        members = {member.profile_id: member for member in members.select_related('profile__user')}
+
+        ranked_members = []
+        for profile_id, points, rank in ranked:
+            # The member may have left since the leaderboard was cached
+            if profile_id in members:
+                members[profile_id].points = points
+                members[profile_id].rank = rank
+                ranked_members.append(members[profile_id])
+        return ranked_members
+
+    @classmethod
+    def invalidate_leaderboards(cls, league_ids):
         """
-        members = self.leaguemember_set.filter(status='joined')
-        members = sorted(members, key=lambda member: member.total_points(), reverse=True)
-        return members
+        Remove the cached leaderboards of these leagues.
+
+        Args:
+            league_ids (Iterable[int]): The ids of the leagues.
+        """
+        cache.delete_many([cls.leaderboard_cache_key(league_id) for league_id in league_ids])
 
     def get_admins(self):
         """
@@ -331,14 +412,6 @@ class LeagueMember(models.Model):
         Return the total points earned by the league member.
 
         Returns:
-            total_points (int): The sum of the values of the member's completed tasks.
+            total_points (int): The sum of the values of the member's completed tasks minus their exploded tasks.
         """
-        points = 0
-        for task in TaskInstance.objects.filter(profile=self.profile, status=TaskInstance.COMPLETED):
-            points += task.task.points
-
-        # Subtract exploded tasks
-        for task in TaskInstance.objects.filter(profile=self.profile, status=TaskInstance.EXPLODED):
-            points -= task.task.points
-
-        return points
+        return self.profile.points
@@ -1,7 +1,10 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
-from notifications.signals import notify
-from leagues.models import LeagueMember
+
+from accounts import dispatch
+from leagues.models import League, LeagueMember
+from tasks.models import points_changed
 
 
 @receiver(post_save, sender=LeagueMember)
@@ -11,21 +14,49 @@ def send_league_notification(sender, instance, created, **kwargs):
     When a user has requested to join a league owned by you.
     When a user has joined a league owned by you.
     When a user has invited you to join thier league.
+    The league's admins are only looked up when a notification is sent.
     """
-    admins = instance.league.get_admins()
     if created and instance.status == 'pending':
-        for admin in admins:
-            notify.send(instance.profile, recipient=admin.profile.user, verb='requested to join your league.',
-                        action_object=instance, target=instance.league, url=instance.league.get_absolute_url(), public=False)
+        league = instance.league
+        dispatch.send(instance.profile, get_admin_user_ids(league), 'requested to join your league.',
+                      action_object=instance, target=league, url=league.get_absolute_url())
 
     if not created and instance.status == 'joined':
-        for admin in admins:
-            notify.send(instance.profile, recipient=admin.profile.user, verb='joined your league.',
-                        action_object=instance, target=instance.league, url=instance.league.get_absolute_url(), public=False)
+        league = instance.league
+        dispatch.send(instance.profile, get_admin_user_ids(league), 'joined your league.',
+                      action_object=instance, target=league, url=league.get_absolute_url())
 
     if not created and instance.status == 'invited':
-        for admin in admins:
-            notify.send(admin.profile.user, recipient=instance.profile.user, verb='invited you to become a member',
-                        action_object=instance, target=instance.league, url=instance.league.get_absolute_url(),
-                        public=False)
-            break
+        league = instance.league
+        admin = league.get_admins().select_related('profile__user').first()
+        if admin is not None:
+            dispatch.send(admin.profile.user, [instance.profile.user_id], 'invited you to become a member',
+                          action_object=instance, target=league, url=league.get_absolute_url())
+
+
+def get_admin_user_ids(league):
+    """
+    Return the user ids of a league's admins, as a QuerySet which is only run when the notification is written.
+    """
+    return league.get_admins().values_list('profile__user_id', flat=True)
+
+
+@receiver(points_changed)
+def invalidate_points_leaderboards(sender, profile_ids, **kwargs):
+    """
+    Remove the cached leaderboards of leagues joined by profiles whose points changed.
+    """
+    league_ids = set(LeagueMember.objects.filter(profile_id__in=profile_ids, status='joined')
+                     .values_list('league_id', flat=True))
+    if league_ids:
+        transaction.on_commit(lambda: League.invalidate_leaderboards(league_ids))
+
+
+@receiver(post_save, sender=LeagueMember)
+@receiver(post_delete, sender=LeagueMember)
+def invalidate_member_leaderboard(sender, instance, **kwargs):
+    """
+    Remove the cached leaderboard of a league when a member joins, leaves or changes status.
+    """
+    league_id = instance.league_id
+    transaction.on_commit(lambda: League.invalidate_leaderboards([league_id]))
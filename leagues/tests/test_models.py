@@ -1,9 +1,19 @@
 from unittest import TestCase
 
+import django.test
+from django.core.cache import cache
 from django.core.exceptions import ValidationError, ObjectDoesNotExist
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
 
+from accounts.dispatch import NotificationMiddleware
 from friends.tests.factories import ProfileFactory
+from leagues.models import League, LeagueMember
 from leagues.tests.factories import LeagueFactory
+from tasks.models import TaskInstance
+from tasks.tests.factories import TaskFactory, TaskInstanceFactory
 
 
 # Test if a user can join a league
@@ -150,3 +160,109 @@ class LeagueMemberKick(TestCase):
         self.league_instance.delete()
         self.profile_instance.user.delete()
         self.profile_instance.delete()
+
+
+class LeagueRanking(TestCase):
+
+    def setUp(self):
+        self.league_instance = LeagueFactory()
+        self.profiles = [ProfileFactory() for i in range(4)]
+        for profile in self.profiles:
+            self.league_instance.join(None, profile)
+
+        task = TaskFactory(points=10)
+        for profile, completed in zip(self.profiles, [2, 2, 1, 0]):
+            for i in range(completed):
+                TaskInstanceFactory(task=task, profile=profile, status=TaskInstance.COMPLETED)
+        TaskInstanceFactory(task=task, profile=self.profiles[3], status=TaskInstance.EXPLODED)
+
+    def test_ranked_members(self):
+        members = list(self.league_instance.get_ranked_members())
+
+        # Members with the same points share a rank and are ordered by username
+        tied = sorted(self.profiles[:2], key=lambda profile: profile.user.username)
+        self.assertEqual([member.profile for member in members], tied + self.profiles[2:])
+        self.assertEqual([member.points for member in members], [20, 20, 10, -10])
+        self.assertEqual([member.rank for member in members], [1, 1, 3, 4])
+
+    def test_ranked_members_limit_offset(self):
+        members = list(self.league_instance.get_ranked_members(limit=2, offset=1))
+        self.assertEqual([member.rank for member in members], [1, 3])
+
+    def tearDown(self):
+        self.league_instance.delete()
+        for profile in self.profiles:
+            profile.user.delete()
+
+
+class LeagueLeaderboardCache(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.league_instance = LeagueFactory()
+        self.profiles = [ProfileFactory() for i in range(2)]
+        for profile in self.profiles:
+            self.league_instance.join(None, profile)
+        self.task = TaskFactory(points=10)
+        TaskInstanceFactory(task=self.task, profile=self.profiles[0], status=TaskInstance.COMPLETED)
+
+    def test_leaderboard_cached(self):
+        leaderboard = self.league_instance.get_leaderboard()
+        self.assertEqual(leaderboard, [(self.profiles[0].id, 10), (self.profiles[1].id, 0)])
+        self.assertEqual(cache.get(League.leaderboard_cache_key(self.league_instance.id)), leaderboard)
+
+    def test_leaderboard_members(self):
+        members = self.league_instance.get_leaderboard_members()
+        self.assertEqual([member.profile for member in members], self.profiles)
+        self.assertEqual([(member.points, member.rank) for member in members], [(10, 1), (0, 2)])
+
+    def test_completed_task_invalidates(self):
+        self.league_instance.get_leaderboard()
+        TaskInstanceFactory(task=self.task, profile=self.profiles[1], status=TaskInstance.COMPLETED)
+        TaskInstanceFactory(task=self.task, profile=self.profiles[1], status=TaskInstance.COMPLETED)
+        self.assertEqual(self.league_instance.get_leaderboard(), [(self.profiles[1].id, 20), (self.profiles[0].id, 10)])
+
+    def test_join_invalidates(self):
+        self.league_instance.get_leaderboard()
+        profile = ProfileFactory()
+        self.league_instance.join(None, profile)
+        self.assertIn((profile.id, 0), self.league_instance.get_leaderboard())
+        profile.user.delete()
+
+    def tearDown(self):
+        self.league_instance.delete()
+        for profile in self.profiles:
+            profile.user.delete()
+        self.task.delete()
+
+
+class LeagueNotifications(django.test.TestCase):
+
+    def setUp(self):
+        self.league = LeagueFactory()
+        self.admins = ProfileFactory.create_batch(2)
+        for admin in self.admins:
+            self.league.add_admin(admin)
+
+    def test_join_notifies_admins_in_one_insert(self):
+        """Verify that the notifications sent while handling a request are written with a single INSERT."""
+        profile = ProfileFactory()
+
+        def view(request):
+            # Run the commit callbacks inside the request, as they would be outside a test
+            with self.captureOnCommitCallbacks(execute=True):
+                self.league.join(None, profile)
+            return HttpResponse()
+
+        with CaptureQueriesContext(connection) as queries:
+            NotificationMiddleware(view)(RequestFactory().get('/'))
+        inserts = [query for query in queries if 'INSERT INTO "notifications_notification"' in query['sql']]
+        self.assertEqual(len(inserts), 1)
+        for admin in self.admins:
+            self.assertEqual(admin.user.notifications.get(verb='joined your league.').actor, profile)
+
+    def test_admins_not_loaded_without_notification(self):
+        """Verify that saving a member which sends no notification does not look up the league or its admins."""
+        profile = ProfileFactory()
+        with self.assertNumQueries(1):
+            LeagueMember.objects.create(league_id=self.league.pk, profile=profile, status='joined')
@@ -1,5 +1,6 @@
 from django.contrib import messages
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.paginator import Paginator
 from django.db.models import Q
 from django.shortcuts import redirect, get_object_or_404
 from django.urls import reverse_lazy
@@ -68,12 +69,14 @@ class LeagueDetailView(DetailView):
     Attributes:
         model (League): The thing being displayed.
         context_object_name (str): What this is called in the template.
+        members_per_page (int): The number of members shown on each page of the leaderboard.
 
     Methods:
         get_context_data(self, **kwargs): Return the details of a league.
     """
     model = League
     context_object_name = 'league'
+    members_per_page = 50
 
     def get_context_data(self, **kwargs):
         """
@@ -86,7 +89,10 @@ class LeagueDetailView(DetailView):
             context (dict[str, Any]): The details of the league.
         """
         context = super().get_context_data(**kwargs)
-        context['members'] = self.object.get_ranked_members()
+        paginator = Paginator(self.object.get_leaderboard(), self.members_per_page)
+        context['members_page'] = paginator.get_page(self.request.GET.get('page'))
+        context['members'] = self.object.get_leaderboard_members(
+            limit=self.members_per_page, offset=(context['members_page'].number - 1) * self.members_per_page)
         context['is_member'] = False
         context['is_pending'] = False
         context['is_invited'] = False
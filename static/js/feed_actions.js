@@ -0,0 +1,26 @@
+// Like and report tasks in the feed without reloading it, falling back to the form if the request fails
+document.addEventListener('submit', (event) => {
+    let form = event.target.closest('.like-form, .report-form');
+    if (form === null) {
+        return;
+    }
+    event.preventDefault();
+    let button = form.querySelector('button');
+    button.disabled = true;
+    fetch(form.action, {method: 'POST', body: new FormData(form), headers: {'Accept': 'application/json'}})
+        .then(response => response.ok ? response.json() : Promise.reject(response))
+        .then(data => {
+            if (form.classList.contains('like-form')) {
+                form.querySelector('.like-count').textContent = data.likes;
+                button.classList.replace('btn-primary', 'btn-success');
+                let status = form.closest('.feed-task').querySelector('.task-status');
+                status.textContent = data.status;
+                status.className = `badge ${data.status_colour} fs-12 task-status`;
+            } else if (data.deleted) {
+                form.closest('.feed-task').remove();
+            } else {
+                button.classList.replace('btn-light', 'btn-danger');
+            }
+        })
+        .catch(() => form.submit());
+});
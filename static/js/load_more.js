@@ -0,0 +1,12 @@
+// Replace a 'load more' button with the next page of tasks it points to
+document.addEventListener('click', (event) => {
+    let button = event.target.closest('.load-more button');
+    if (button === null) {
+        return;
+    }
+    button.disabled = true;
+    fetch(button.dataset.url)
+        .then(response => response.text())
+        .then(html => button.closest('.load-more').outerHTML = html)
+        .catch(() => button.disabled = false);
+});
@@ -12,9 +12,14 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 # Run assign_tasks every day at 11:00 AM
+# Run approve_tasks every hour
 app.conf.beat_schedule = {
     'assign_task': {
         'task': 'assign_tasks',
         'schedule': crontab(hour=11, minute=00),
     },
+    'approve_task': {
+        'task': 'approve_tasks',
+        'schedule': crontab(minute=00),
+    },
 }
@@ -65,6 +65,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'accounts.dispatch.NotificationMiddleware',
 ]
 
 ROOT_URLCONF = 'sustainability.urls'
@@ -179,6 +180,30 @@ else:
 CELERY_BROKER_URL = os.getenv('REDIS_URL')
 CELERY_RESULT_BACKEND = os.getenv('REDIS_URL')
 
+# Configure the cache, used for league leaderboards, friend ids, geocoded addresses and navbar counters
+# In production redis is used so that every worker shares the cache, in development memory is used instead
+if DEBUG:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+
+# How addresses are found from the coordinates shared when completing a task,
+# tasks.geocoding.OfflineGeocoder makes no requests and is used in tests,
+# tasks.geocoding.GazetteerGeocoder finds the nearest place in a CSV of places without making any requests
+GEOCODER_BACKEND = os.getenv('GEOCODER_BACKEND', 'tasks.geocoding.NominatimGeocoder')
+GEOCODER_GAZETTEER_PATH = os.getenv('GEOCODER_GAZETTEER_PATH', os.path.join(BASE_DIR, 'tasks', 'data', 'gazetteer.csv'))
+# Points further than this many kilometres from every place in the gazetteer have no address
+GEOCODER_GAZETTEER_MAX_DISTANCE = float(os.getenv('GEOCODER_GAZETTEER_MAX_DISTANCE', 25))
+
 
 # If AI environment variable is set to 1, then set AI to True, otherwise set AI to False
 # Enable AI by changing the value of AI in .env file to 1
@@ -187,3 +212,14 @@ AI = str(os.getenv('AI', '0')).lower() in ['true', 't', '1']
 
 if AI:
     INSTALLED_APPS.append('imagenet.apps.ImagenetConfig')
+
+    # Photos are classified by a separate worker which only consumes the imagenet queue
+    CELERY_TASK_ROUTES = {'classify_photos': {'queue': 'imagenet'}}
+
+    # How photos are classified: 'pytorch', 'quantized' for PyTorch with int8 linear layers (faster on CPUs),
+    # or 'onnx' for ONNX Runtime, which needs onnxruntime and the model exported with manage.py exportonnx
+    AI_BACKEND = os.getenv('AI_BACKEND', 'pytorch')
+    AI_ONNX_PATH = os.getenv('AI_ONNX_PATH', os.path.join(BASE_DIR, 'imagenet', 'convnext-base-224.onnx'))
+
+    # How many predictions are kept, so photos which are uploaded again are not classified again
+    AI_PREDICTION_CACHE_SIZE = int(os.getenv('AI_PREDICTION_CACHE_SIZE', 10000))
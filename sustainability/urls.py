@@ -5,6 +5,7 @@ from django.contrib import admin
 from django.urls import path, include
 from django.views.generic import RedirectView
 
+from accounts.views import MarkAllAsReadView
 from feed.views import HomeView
 
 admin.site.site_header = 'Gamekeeper Area'
@@ -31,7 +32,8 @@ urlpatterns = [
     # Home route
     path('', HomeView.as_view(), name='home'),
 
-    # Notifications
+    # Notifications, marking all as read also resets the cached unread count
+    path('notifications/mark-all-as-read/', MarkAllAsReadView.as_view(), name='mark_all_as_read'),
     path('notifications/', include('notifications.urls')),
 
     # Gamekeeper routes
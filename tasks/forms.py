@@ -2,9 +2,11 @@ import os
 import uuid
 
 from django import forms
-from geopy import Nominatim
+from django.db import transaction
 
+from tasks.geocoding import get_geocoder, reverse_geocode
 from tasks.models import TaskInstance
+from tasks.tasks import geocode_task_instance
 
 
 class CompleteTaskForm(forms.ModelForm):
@@ -20,7 +22,8 @@ class CompleteTaskForm(forms.ModelForm):
         longitude (FloatField): User's longitude.
 
     Methods:
-        save(self, commit): Mark the task as Pending Approval and save the photo with a random UUID filename.
+        save(self, commit): Mark the task as Pending Approval, save the photo with a random UUID filename,
+            and queue finding the address of the user's location.
     """
 
     class Meta:
@@ -36,6 +39,8 @@ class CompleteTaskForm(forms.ModelForm):
     def save(self, commit=True):
         """
         Mark the task as Pending Approval and save the photo with a random UUID filename.
+        If the user shared their location, the address is found by a Celery task once the task instance is saved,
+        so the user does not wait for a remote geocoder. Local geocoders are fast enough to find it straight away.
 
         Returns:
             task_instance (TaskInstance): The completed task instance.
@@ -51,16 +56,18 @@ class CompleteTaskForm(forms.ModelForm):
         task_instance.report_task_complete()
 
         # Get the address from the latitude and longitude
-        if self.cleaned_data.get('share_location'):
-            longitude = self.cleaned_data.get('longitude')
-            latitude = self.cleaned_data.get('latitude')
-            geolocator = Nominatim(user_agent="admin@sustainandgain.fun")
-            if longitude is not None and latitude is not None:
-                location = geolocator.reverse(f"{latitude}, {longitude}")
-                if location.address is not None:
-                    task_instance.location = ",".join(location.address.split(",")[:3])
+        longitude = self.cleaned_data.get('longitude')
+        latitude = self.cleaned_data.get('latitude')
+        share_location = self.cleaned_data.get('share_location') and longitude is not None and latitude is not None
+        remote = share_location and get_geocoder().remote
+        if share_location and not remote:
+            task_instance.location = reverse_geocode(latitude, longitude)
 
         if commit:
             task_instance.save()
 
+            # Remote geocoders are called in the background once the task instance is saved
+            if remote:
+                transaction.on_commit(lambda: geocode_task_instance.delay(task_instance.pk, latitude, longitude))
+
         return task_instance
@@ -0,0 +1,231 @@
+import csv
+import math
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.module_loading import import_string
+
+# Coordinates are rounded to this many decimal places before being looked up, about 100 m,
+# so every photo taken around the same place shares one cached address
+CACHE_PRECISION = 3
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+
+EARTH_RADIUS_KM = 6371
+
+
+class NominatimGeocoder:
+    """
+    Finds addresses with OpenStreetMap's Nominatim service, which allows at most one request a second.
+
+    Attributes:
+        remote (bool): Whether the geocoder makes requests, so its addresses are cached and found in the background.
+
+    Methods:
+        reverse(self, latitude, longitude): Return the address at a point.
+    """
+    remote = True
+
+    def __init__(self):
+        from geopy import Nominatim
+
+        self.geolocator = Nominatim(user_agent="admin@sustainandgain.fun", timeout=10)
+
+    def reverse(self, latitude, longitude):
+        """
+        Return the address at a point.
+
+        Args:
+            latitude (float): The latitude.
+            longitude (float): The longitude.
+
+        Returns:
+            str: The first three parts of the address, or None if there is no address there.
+        """
+        location = self.geolocator.reverse(f"{latitude}, {longitude}")
+        if location is None or location.address is None:
+            return None
+        return ",".join(location.address.split(",")[:3])
+
+
+class OfflineGeocoder:
+    """
+    Stands in for a remote geocoder in tests and development, without making any requests.
+
+    Attributes:
+        remote (bool): Treated as remote, so it is cached and run in the background like NominatimGeocoder.
+
+    Methods:
+        reverse(self, latitude, longitude): Return the rounded coordinates as the address.
+    """
+    remote = True
+
+    def reverse(self, latitude, longitude):
+        """
+        Return the rounded coordinates as the address.
+
+        Args:
+            latitude (float): The latitude.
+            longitude (float): The longitude.
+
+        Returns:
+            str: The coordinates, e.g. '50.736, -3.534'.
+        """
+        return f"{latitude:.{CACHE_PRECISION}f}, {longitude:.{CACHE_PRECISION}f}"
+
+
+class KDTree:
+    """
+    A k-d tree for finding which of a fixed set of points is nearest to another point.
+
+    Attributes:
+        points (list[tuple[float, ...]]): The points, which all have the same number of dimensions.
+        root (tuple): The root node, each node is (index of its point, axis, left node, right node).
+
+    Methods:
+        nearest(self, point): Return the index of the nearest point and its squared distance.
+    """
+
+    def __init__(self, points):
+        self.points = points
+        self.root = self.build(list(range(len(points))), 0)
+
+    def build(self, indices, depth):
+        if not indices:
+            return None
+        axis = depth % len(self.points[indices[0]])
+        indices.sort(key=lambda index: self.points[index][axis])
+        median = len(indices) // 2
+        return (indices[median], axis,
+                self.build(indices[:median], depth + 1), self.build(indices[median + 1:], depth + 1))
+
+    def nearest(self, point):
+        """
+        Return the index of the nearest point and its squared distance.
+
+        Args:
+            point (tuple[float, ...]): The point to search from.
+
+        Returns:
+            tuple[int, float]: The index of the nearest point, or None if there are no points, and its squared distance.
+        """
+        best_index, best_distance = None, math.inf
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                continue
+            index, axis, left, right = node
+            candidate = self.points[index]
+            distance = sum((a - b) ** 2 for a, b in zip(point, candidate))
+            if distance < best_distance:
+                best_index, best_distance = index, distance
+
+            difference = point[axis] - candidate[axis]
+            near, far = (left, right) if difference < 0 else (right, left)
+            # Only search the far side if the nearest point could be on it
+            if difference ** 2 < best_distance:
+                stack.append(far)
+            stack.append(near)
+        return best_index, best_distance
+
+
+def to_unit_vector(latitude, longitude):
+    """
+    Return where a point is on a sphere of radius 1, so the nearest place by straight line distance
+    is also the nearest along the Earth's surface.
+
+    Args:
+        latitude (float): The latitude.
+        longitude (float): The longitude.
+
+    Returns:
+        tuple[float, float, float]: The x, y and z coordinates.
+    """
+    latitude, longitude = math.radians(latitude), math.radians(longitude)
+    return math.cos(latitude) * math.cos(longitude), math.cos(latitude) * math.sin(longitude), math.sin(latitude)
+
+
+class GazetteerGeocoder:
+    """
+    Finds the nearest place in a gazetteer, a CSV of place names and coordinates, without making any requests.
+    The gazetteer is loaded into a k-d tree once per process, so each lookup takes microseconds.
+
+    Attributes:
+        remote (bool): Lookups are fast enough to run while the form is saved, and are not cached.
+        places (list[str]): The name of each place, e.g. 'Streatham Campus, Exeter, Devon'.
+        tree (KDTree): The places as unit vectors.
+        max_distance (float): The squared straight line distance of GEOCODER_GAZETTEER_MAX_DISTANCE.
+
+    Methods:
+        reverse(self, latitude, longitude): Return the nearest place.
+    """
+    remote = False
+
+    def __init__(self):
+        with open(settings.GEOCODER_GAZETTEER_PATH, newline='', encoding='utf-8') as gazetteer:
+            rows = list(csv.DictReader(gazetteer))
+        self.places = [row['place'] for row in rows]
+        self.tree = KDTree([to_unit_vector(float(row['latitude']), float(row['longitude'])) for row in rows])
+        angle = settings.GEOCODER_GAZETTEER_MAX_DISTANCE / EARTH_RADIUS_KM
+        self.max_distance = (2 * math.sin(angle / 2)) ** 2
+
+    def reverse(self, latitude, longitude):
+        """
+        Return the nearest place.
+
+        Args:
+            latitude (float): The latitude.
+            longitude (float): The longitude.
+
+        Returns:
+            str: The name of the nearest place, or None if no place is within GEOCODER_GAZETTEER_MAX_DISTANCE.
+        """
+        index, distance = self.tree.nearest(to_unit_vector(latitude, longitude))
+        if index is None or distance > self.max_distance:
+            return None
+        return self.places[index]
+
+
+@lru_cache(maxsize=None)
+def load_geocoder(path):
+    return import_string(path)()
+
+
+def get_geocoder():
+    """
+    Return the geocoder chosen by the GEOCODER_BACKEND setting.
+
+    Returns:
+        NominatimGeocoder | OfflineGeocoder | GazetteerGeocoder: The geocoder.
+    """
+    return load_geocoder(settings.GEOCODER_BACKEND)
+
+
+def geocode_cache_key(latitude, longitude):
+    return f'geocoding:{round(latitude, CACHE_PRECISION)}:{round(longitude, CACHE_PRECISION)}'
+
+
+def reverse_geocode(latitude, longitude):
+    """
+    Return the address at a point.
+    Addresses from remote geocoders come from the cache if somewhere near the point has been looked up before.
+
+    Args:
+        latitude (float): The latitude.
+        longitude (float): The longitude.
+
+    Returns:
+        str: The address, or None if there is no address there.
+    """
+    geocoder = get_geocoder()
+    if not geocoder.remote:
+        return geocoder.reverse(latitude, longitude)
+
+    key = geocode_cache_key(latitude, longitude)
+    address = cache.get(key)
+    if address is None:
+        # Remember points without an address as an empty string, so they are not looked up again
+        address = geocoder.reverse(latitude, longitude) or ''
+        cache.set(key, address, CACHE_TIMEOUT)
+    return address or None
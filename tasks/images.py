@@ -0,0 +1,103 @@
+import os
+from io import BytesIO
+
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+# The largest width and height of each variant of an image
+VARIANT_SIZES = {
+    'thumbnail': (96, 96),
+    'card': (480, 480),
+    'full': (800, 800),
+}
+
+# Each variant is saved in these formats, WebP for browsers which support it and JPEG for those which do not
+VARIANT_FORMATS = {
+    'webp': 'WEBP',
+    'jpg': 'JPEG',
+}
+VARIANT_QUALITY = 80
+
+# How long to remember that a variant has not been generated yet before checking storage again
+MISSING_VARIANT_TIMEOUT = 60
+
+
+def variant_name(name, variant, extension):
+    """
+    Return the name of a variant of an image, which is kept in a variants folder next to the original.
+    The name keeps the original's extension, so images which only differ by extension have different variants.
+
+    Args:
+        name (str): The name of the original image, e.g. 'task_photos/abc.jpg'.
+        variant (str): The variant, one of VARIANT_SIZES.
+        extension (str): The format of the variant, one of VARIANT_FORMATS.
+
+    Returns:
+        str: The name of the variant, e.g. 'task_photos/variants/abc.jpg.card.webp'.
+    """
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'variants', f'{filename}.{variant}.{extension}')
+
+
+def variant_cache_key(name, variant):
+    return f'images:variants:{name}:{variant}'
+
+
+def generate_variants(field_file, variants):
+    """
+    Save each variant of an image in every format, replacing any variants saved before.
+
+    Args:
+        field_file (FieldFile): The original image, e.g. task_instance.photo.
+        variants (Iterable[str]): The variants to save, from VARIANT_SIZES.
+    """
+    storage = field_file.storage
+    with storage.open(field_file.name) as original, Image.open(original) as img:
+        img = ImageOps.exif_transpose(img).convert('RGB')
+
+    for variant in variants:
+        resized = img.copy()
+        resized.thumbnail(VARIANT_SIZES[variant], Image.LANCZOS)
+        for extension, image_format in VARIANT_FORMATS.items():
+            content = BytesIO()
+            resized.save(content, format=image_format, quality=VARIANT_QUALITY)
+            name = variant_name(field_file.name, variant, extension)
+            storage.delete(name)
+            storage.save(name, ContentFile(content.getvalue()))
+        cache.set(variant_cache_key(field_file.name, variant), True, None)
+
+
+def delete_variants(storage, name):
+    """
+    Delete every variant of an image and forget whether they have been generated,
+    so a replaced image's variants are not left behind or shown in place of a new image with the same name.
+
+    Args:
+        storage (Storage): The storage the image is kept in.
+        name (str): The name of the image.
+    """
+    for variant in VARIANT_SIZES:
+        for extension in VARIANT_FORMATS:
+            storage.delete(variant_name(name, variant, extension))
+    cache.delete_many([variant_cache_key(name, variant) for variant in VARIANT_SIZES])
+
+
+def has_variant(field_file, variant):
+    """
+    Check whether the variants of an image have been generated, remembering the answer in the cache.
+
+    Args:
+        field_file (FieldFile): The original image.
+        variant (str): The variant, from VARIANT_SIZES.
+
+    Returns:
+        bool: Whether the variant has been saved in every format.
+    """
+    key = variant_cache_key(field_file.name, variant)
+    exists = cache.get(key)
+    if exists is None:
+        exists = all(field_file.storage.exists(variant_name(field_file.name, variant, extension))
+                     for extension in VARIANT_FORMATS)
+        cache.set(key, exists, None if exists else MISSING_VARIANT_TIMEOUT)
+    return exists
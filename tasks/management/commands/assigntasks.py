@@ -1,9 +1,13 @@
 import random
+import time
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
 
 from friends.models import Profile
 from tasks.models import Task, TaskInstance
+from tasks.signals import send_tag_notifications
 
 
 class Command(BaseCommand):
@@ -12,50 +16,95 @@ class Command(BaseCommand):
 
     Attributes:
         help:   The help message given by the console for this command
+        chunk_size:   The default number of profiles assigned a task in each transaction
 
     Methods:
+        add_arguments(self, parser):   Add the --chunk-size option
         handle(self):   The code run by calling this command
+        assign_chunk(self, profiles, ...):   Assign a task to each profile in a chunk
     """
     help = 'Assigns a valid task to each user'
+    chunk_size = 1000
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=self.chunk_size,
+                            help='Number of profiles assigned a task in each transaction')
 
     def handle(self, *args, **options):
         """
         The code run by calling this command.
 
-        Iterates through all users and assigns users with less than five active tasks a new task from Sustainable Steve
+        Assigns users with five or fewer active tasks a new task from Sustainable Steve.
+        Which tasks each user already has active and cannot be given are worked out for every user up front,
+        so choosing a task needs no queries, and the new task instances are saved in chunks.
+        """
+        chunk_size = options.get('chunk_size') or self.chunk_size
+        verbosity = options.get('verbosity', 1)
+        start = time.monotonic()
+
+        task_ids = list(Task.objects.values_list('id', flat=True))
+        task_titles = dict(Task.objects.values_list('id', 'title')) if verbosity > 1 else {}
+        unavailable = Task.get_unavailable_ids()
+        active_counts = dict(TaskInstance.objects.filter(status=TaskInstance.ACTIVE).values_list('profile')
+                             .annotate(active=Count('id')).order_by())
+
+        profiles = Profile.objects.values_list('id', 'user_id', 'user__username').order_by('id')
+        chunk = []
+        checked = assigned = 0
+        for profile_id, user_id, username in profiles.iterator(chunk_size=chunk_size):
+            checked += 1
+            active = active_counts.get(profile_id, 0)
+            if active > 5:
+                if verbosity > 1:
+                    self.stdout.write(f"Assigned no tasks to user {username} since they have more than 5 active "
+                                      f"tasks ({active}).")
+                continue
+
+            available = [task_id for task_id in task_ids if task_id not in unavailable.get(profile_id, ())]
+            if not available:
+                if verbosity > 1:
+                    self.stdout.write(f"Assigned no tasks to user {username} since they have no tasks available.")
+                continue
+
+            chunk.append((profile_id, user_id, username, random.choice(available)))
+            if len(chunk) >= chunk_size:
+                assigned += self.assign_chunk(chunk, task_titles, verbosity)
+                chunk = []
+        if chunk:
+            assigned += self.assign_chunk(chunk, task_titles, verbosity)
+
+        elapsed = time.monotonic() - start
+        self.stdout.write(f"Assigned {assigned} task(s) to {checked} user(s) in {elapsed:.1f}s "
+                          f"({checked / elapsed if elapsed else 0:.0f} users/s)")
+
+    def assign_chunk(self, chunk, task_titles, verbosity):
+        """
+        Create an active task instance tagged by Sustainable Steve for each profile in a chunk,
+        and notify each user, in one transaction.
+
+        Args:
+            chunk (list[tuple[int, int, str, int]]): The profile id, user id, username and chosen task id of each user.
+            task_titles (dict[int, str]): Maps task ids to titles, used when reporting each assignment.
+            verbosity (int): Report each assignment if greater than 1.
+
+        Returns:
+            int: The number of task instances created.
         """
+        instances = [
+            TaskInstance(
+                task_id=task_id,
+                profile_id=profile_id,
+                status=TaskInstance.ACTIVE,
+                tagged_by='SusSteve',
+                origin_message='Sustainable Steve tagged you!'
+            )
+            for profile_id, user_id, username, task_id in chunk
+        ]
+        with transaction.atomic():
+            instances = TaskInstance.objects.bulk_create(instances)
+            send_tag_notifications(instances, {profile_id: user_id for profile_id, user_id, _, _ in chunk})
 
-        for profile in Profile.objects.all():
-
-            # filter task instances which are active and have not been completed
-            active_tasks = TaskInstance.objects.filter(profile=profile, status=TaskInstance.ACTIVE)
-            if len(active_tasks) > 5:
-                print(f"Assigned no tasks to user {profile.user.username} since they have more than 5 active tasks "
-                      f"({len(active_tasks)}).")
-
-            elif len(active_tasks) == Task.objects.all().count():
-                print(f"Assigned no tasks to user {profile.user.username} since they have all tasks active.")
-
-            else:
-                random_task = random.choice(Task.objects.all())
-
-                # Check if the random task is available for the user.
-                # If not, keep trying until we find one that is available (max 100 tries).
-                for i in range(100):
-                    if random_task.is_available(profile):
-                        break
-                    else:
-                        random_task = random.choice(Task.objects.all())
-
-                # then create a new instance of that task for them
-                if random_task.is_available(profile):
-                    t = TaskInstance(
-                        task=random_task,
-                        profile=profile,
-                        status=TaskInstance.ACTIVE,
-                        tagged_by='SusSteve',
-                        origin_message='Sustainable Steve tagged you!'
-                    )
-                    t.save()
-
-                    print(f"Assigned task {random_task.title} to user {profile.user.username}")
+        if verbosity > 1:
+            for profile_id, user_id, username, task_id in chunk:
+                self.stdout.write(f"Assigned task {task_titles[task_id]} to user {username}")
+        return len(instances)
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+
+from friends.models import Profile
+from friends.tasks import PROFILE_IMAGE_VARIANTS
+from tasks.images import generate_variants
+from tasks.models import TaskInstance
+from tasks.tasks import TASK_PHOTO_VARIANTS
+
+
+class Command(BaseCommand):
+    """
+    A command that can be run from the console via manage.py to generate the variants of every task photo and
+    profile image. Variants of new images are generated as they are uploaded, so this is only needed for images
+    uploaded before variants existed, or after the variant sizes or names change.
+
+    Attributes:
+        help:   The help message given by the console for this command
+
+    Methods:
+        handle(self):   The code run by calling this command
+    """
+    help = 'Generates the variants of every task photo and profile image'
+
+    def handle(self, *args, **options):
+        """
+        The code run by calling this command.
+
+        Generates the variants of each distinct task photo and profile image, skipping files which cannot be read.
+        """
+        images = [
+            (TaskInstance.objects.exclude(photo='').exclude(photo=None), 'photo', TASK_PHOTO_VARIANTS),
+            (Profile.objects.all(), 'image', PROFILE_IMAGE_VARIANTS),
+        ]
+
+        generated = 0
+        for queryset, field_name, variants in images:
+            names = set()
+            for instance in queryset.only(field_name).iterator():
+                field_file = getattr(instance, field_name)
+                if field_file.name in names:
+                    continue
+                names.add(field_file.name)
+                try:
+                    generate_variants(field_file, variants)
+                    generated += 1
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f"Could not generate variants of {field_file.name}: {error}")
+
+        self.stdout.write(f"Generated variants of {generated} image(s)")
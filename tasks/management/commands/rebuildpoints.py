@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from friends.models import Profile
+from tasks.models import TaskInstance
+
+
+class Command(BaseCommand):
+    """
+    A command that can be run from the console via manage.py to rebuild every profile's points from their task history.
+    Points are kept up to date as tasks change status, by Django and by the Rust worker exploding bomb tasks,
+    but need rebuilding if they are changed some other way, e.g. if a Gamekeeper changes the points a task is worth.
+
+    Attributes:
+        help:   The help message given by the console for this command
+        chunk_size:   The default number of profiles rebuilt in each transaction
+
+    Methods:
+        add_arguments(self, parser):   Add the --chunk-size option
+        handle(self):   The code run by calling this command
+        rebuild_chunk(self, profile_ids):   Rebuild the points of a chunk of profiles
+    """
+    help = "Rebuilds every profile's points from their completed and exploded tasks"
+    chunk_size = 500
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=self.chunk_size,
+                            help='Number of profiles rebuilt in each transaction')
+
+    def handle(self, *args, **options):
+        """
+        The code run by calling this command.
+
+        Sums the points of each profile's completed tasks minus their exploded tasks, and saves any totals which differ.
+        Profiles are rebuilt in chunks, so only the profiles of one chunk are locked at a time.
+        """
+        chunk_size = options.get('chunk_size') or self.chunk_size
+        profile_ids = list(Profile.objects.values_list('id', flat=True).order_by('id'))
+        rebuilt = 0
+        for start in range(0, len(profile_ids), chunk_size):
+            rebuilt += self.rebuild_chunk(profile_ids[start:start + chunk_size])
+
+        self.stdout.write(f"Rebuilt points for {rebuilt} profile(s)")
+
+    def rebuild_chunk(self, profile_ids):
+        """
+        Rebuild the points of a chunk of profiles in one transaction.
+
+        Args:
+            profile_ids (list[int]): The ids of the profiles.
+
+        Returns:
+            int: The number of profiles whose points were changed.
+        """
+        with transaction.atomic():
+            # Lock the profiles before summing, so points added by a task which changes status meanwhile
+            # are either waited for and counted, or added after the rebuild, rather than overwritten
+            locked = list(Profile.objects.select_for_update().filter(pk__in=profile_ids).only('id', 'points'))
+            totals = dict(TaskInstance.objects.filter(profile_id__in=profile_ids).values_list('profile').annotate(
+                points=TaskInstance.points_sum()).order_by())
+
+            profiles = []
+            for profile in locked:
+                points = totals.get(profile.id, 0)
+                if profile.points != points:
+                    profile.points = points
+                    profiles.append(profile)
+            Profile.objects.bulk_update(profiles, ['points'])
+        return len(profiles)
@@ -0,0 +1,35 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:17
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_reports(apps, schema_editor):
+    """
+    Count the reports of every task instance which has been reported.
+    """
+    TaskInstance = apps.get_model('tasks', 'TaskInstance')
+    reports = TaskInstance.reports.through.objects.filter(taskinstance=OuterRef('pk'))
+    TaskInstance.objects.filter(reports__isnull=False).update(report_count=Coalesce(Subquery(
+        reports.values('taskinstance').annotate(count=Count('pk')).values('count')), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0022_taskinstance_tagged_by'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskinstance',
+            name='report_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(count_reports, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='taskinstance',
+            index=models.Index(condition=models.Q(('report_count__gt', 0)), fields=['-time_completed', '-id'], name='taskinstance_reported_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.1.7 on 2026-10-17 19:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0023_taskinstance_report_count'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='taskinstance',
+            index=models.Index(fields=['profile', '-time_completed', '-id'], name='taskinstance_feed_idx'),
+        ),
+    ]
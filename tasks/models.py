@@ -1,11 +1,34 @@
 import datetime
 
+from django.core.cache import cache
 from django.core.exceptions import ValidationError
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Case, Count, DateTimeField, Exists, ExpressionWrapper, F, OuterRef, Prefetch, Q, \
+    Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.dispatch import Signal
 from django.utils import timezone
 
 from friends.models import Profile
-from PIL import Image, ExifTags
+from tasks.images import delete_variants
+
+# Sent with the ids of the profiles whose points have changed, whether by a single save or in bulk
+points_changed = Signal()
+
+REPORTED_COUNT_CACHE_KEY = 'tasks:reported_count'
+
+
+def count_rows(queryset):
+    """
+    Return a subquery counting the rows of a ManyToManyField's through table which belong to each task instance.
+
+    Args:
+        queryset (QuerySet): The through table, filtered by taskinstance=OuterRef('pk').
+
+    Returns:
+        Coalesce: The count, 0 if there are no rows.
+    """
+    return Coalesce(Subquery(queryset.values('taskinstance').annotate(count=Count('pk')).values('count')), 0)
 
 
 class TaskCategory(models.Model):
@@ -50,6 +73,8 @@ class Task(models.Model):
     Methods:
         rarity_colour(self): Return badge colour corresponding to rarity.
         is_available(self, profile): Check if the task is available for the current user.
+        get_available(cls, profile, tasks): Return the tasks which are available for the user.
+        get_unavailable_ids(cls, profile_ids, task_ids): Return the ids of the tasks each profile cannot be given.
         clean(self): Raise ValidationError if there are inconsistencies in the time_to_repeat or points.
         __str__(self): Return str(self).
     """
@@ -107,24 +132,65 @@ class Task(models.Model):
         Return False if:
             The user has an ACTIVE or PENDING_APPROVAL instance of this task.
             The time_to_repeat has not elapsed since the task instance became COMPLETED.
+        Unless the user has accepted an instance of this task since, which EXPLODED.
         Otherwise, return True.
 
         Returns:
             Boolean: Whether this task is available for the user.
         """
-        this_task_instances = TaskInstance.objects.filter(task=self.pk, profile=profile.pk)
-        this_task_instances = this_task_instances.order_by('-time_accepted')
+        return self.pk not in self.get_unavailable_ids([profile.pk], [self.pk]).get(profile.pk, set())
 
-        for instance in this_task_instances:
-            if instance.status in [TaskInstance.PENDING_APPROVAL, TaskInstance.ACTIVE]:
-                return False
-            elif instance.status in [TaskInstance.EXPLODED]:
-                return True
-            else:
-                if timezone.now() < instance.time_completed + instance.task.time_to_repeat:
-                    return False
+    @classmethod
+    def get_available(cls, profile, tasks):
+        """
+        Return the tasks which are available for the user, checking all of them in one query.
 
-        return True
+        Args:
+            profile (Profile): The user's profile.
+            tasks (Iterable[Task]): The tasks to check.
+
+        Returns:
+            list[Task]: The tasks for which is_available is True, in the same order.
+        """
+        tasks = list(tasks)
+        unavailable = cls.get_unavailable_ids([profile.pk], [task.pk for task in tasks]).get(profile.pk, set())
+        return [task for task in tasks if task.pk not in unavailable]
+
+    @classmethod
+    def get_unavailable_ids(cls, profile_ids=None, task_ids=None):
+        """
+        Return the ids of the tasks each profile cannot be given, in one query.
+        An ACTIVE, PENDING_APPROVAL, or recently COMPLETED instance blocks its task,
+        unless the profile has since accepted an instance of the task which EXPLODED.
+
+        Args:
+            profile_ids (Iterable[int]): The profiles to check, or None to check every profile.
+            task_ids (Iterable[int]): The tasks to check, or None to check every task.
+
+        Returns:
+            dict[int, set[int]]: Maps each profile id to the ids of its unavailable tasks.
+                Profiles with every task available are left out.
+        """
+        newer_exploded = TaskInstance.objects.filter(
+            profile=OuterRef('profile'), task=OuterRef('task'), status=TaskInstance.EXPLODED,
+            time_accepted__gt=OuterRef('time_accepted'))
+
+        blocking = TaskInstance.objects.annotate(
+            repeat_at=ExpressionWrapper(F('time_completed') + F('task__time_to_repeat'), output_field=DateTimeField())
+        ).filter(
+            Q(status__in=[TaskInstance.ACTIVE, TaskInstance.PENDING_APPROVAL]) |
+            Q(status=TaskInstance.COMPLETED, repeat_at__gt=timezone.now())
+        ).filter(~Exists(newer_exploded))
+        if profile_ids is not None:
+            blocking = blocking.filter(profile__in=profile_ids)
+        if task_ids is not None:
+            blocking = blocking.filter(task__in=task_ids)
+
+        unavailable = {}
+        pairs = blocking.values_list('profile_id', 'task_id').order_by().distinct()
+        for profile_id, task_id in pairs.iterator(chunk_size=5000):
+            unavailable.setdefault(profile_id, set()).add(task_id)
+        return unavailable
 
     def clean(self):
         """
@@ -166,6 +232,7 @@ class TaskInstance(models.Model):
         profile (Profile): Profile of the instance's owner.
         likes (ManyToManyField(Profile, related_name='likes')): Who has liked the task.
         reports (ManyToManyField(Profile, related_name='likes')): Who has reported the task.
+        report_count (PositiveIntegerField): How many users have reported the task.
         location (CharField): Where the task was completed.
         origin_message (CharField): Tells user why task is on their 'my tasks' page.
         tagged_someone (BooleanField): Has the user tagged someone else in this task.
@@ -180,6 +247,17 @@ class TaskInstance(models.Model):
         status_color(self): Return the colour of the task's status badge.
         clean(self): Raise ValidationError if there are inconsistencies in the time_completed and time_accepted.
         report_task_complete(self): The user reports themselves as having completed a task.
+        like(self, profile): Like the task instance, completing it once it has LIKES_TO_COMPLETE likes.
+        report(self, profile): Report the task instance, adding it to the moderation queue.
+        points_value(cls, status, points): Return the points a task instance with this status is worth to its owner.
+        points_sum(cls, path): Return an aggregate of the points task instances are worth to their owner.
+        add_points(cls, points_by_profile): Add points to the total of each profile.
+        bulk_set_status(cls, instances, status): Set the status of many task instances, keeping points up to date.
+        approve_expired(cls): Approve every task which has been pending approval for longer than the approval period.
+        annotate_feed(cls, queryset, profile, reporters): Annotate everything a feed card displays.
+        update_report_counts(cls, ids): Count the reports of task instances again.
+        get_reported_count(cls): Return how many task instances have been reported, from the cache.
+        invalidate_reported_count(cls): Remove the cached number of reported task instances.
     """
 
     # This references the task the user has accepted
@@ -206,6 +284,10 @@ class TaskInstance(models.Model):
     # The profiles of the users who have reported the task, users can only report one post once
     reports = models.ManyToManyField(Profile, related_name='reports', blank=True)
 
+    # How many users have reported the task, kept up to date by the update_report_count signal
+    # so the moderation queue does not count every task's reports
+    report_count = models.PositiveIntegerField(default=0)
+
     # The location of where the task was completed
     location = models.CharField(max_length=500, null=True, blank=True)
 
@@ -221,6 +303,15 @@ class TaskInstance(models.Model):
     # who tagged you
     tagged_by = models.CharField(max_length=150, null=True, blank=True, default=None)
 
+    class Meta:
+        indexes = [
+            # The feed, each friend's tasks are read in order from their most recent after the cursor
+            models.Index(fields=['profile', '-time_completed', '-id'], name='taskinstance_feed_idx'),
+            # The moderation queue, only tasks which have been reported are indexed
+            models.Index(fields=['-time_completed', '-id'], condition=Q(report_count__gt=0),
+                         name='taskinstance_reported_idx'),
+        ]
+
     @property
     def bomb_instance_deadline(self):
         """
@@ -253,6 +344,25 @@ class TaskInstance(models.Model):
         default=ACTIVE,
     )
 
+    # Tasks which have been pending approval for this long are approved automatically
+    APPROVAL_PERIOD = datetime.timedelta(days=7)
+
+    # Tasks pending approval are completed once they have this many likes
+    LIKES_TO_COMPLETE = 3
+
+    # The status this instance was loaded from the database with, used to keep the owner's points up to date
+    _loaded_status = None
+
+    # The name of the photo this instance was loaded from the database with, used to process only new photos
+    _loaded_photo = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_status = instance.__dict__.get('status')
+        instance._loaded_photo = instance.__dict__.get('photo') or None
+        return instance
+
     def __str__(self):
         return f"Task:{self.task.title}; User:{self.profile.user.username}"
 
@@ -300,42 +410,44 @@ class TaskInstance(models.Model):
 
         return self
 
-    # Overwrite save method to resize photo if it is too large
+    # Overwrite save method to keep points up to date and process new photos
     def save(self, *args, **kwargs):
-        # Call the parent save() method to save the object as usual
-        super().save(*args, **kwargs)
-
-        if self.photo:
-            # Open the image file using Pillow
-            img = Image.open(self.photo.path)
-
-            # Extract the orientation information from the image's EXIF metadata
-            contains_orientation = False
-            for orientation in ExifTags.TAGS.keys():
-                if ExifTags.TAGS[orientation] == 'Orientation':
-                    contains_orientation = True
-                    break
-
-            if contains_orientation:
-                exif = img._getexif()
-                if exif:
-                    exif = dict(exif)
-
-                    if orientation in exif:
-                        if exif[orientation] == 3:
-                            img = img.rotate(180, expand=True)
-                        elif exif[orientation] == 6:
-                            img = img.rotate(270, expand=True)
-                        elif exif[orientation] == 8:
-                            img = img.rotate(90, expand=True)
-
-            # Set a maximum size for the photo, e.g., 800x800 pixels
-            max_size = (800, 800)
-
-            # Resize the image if it's larger than the maximum size
-            if img.size[0] > max_size[0] or img.size[1] > max_size[1]:
-                img.thumbnail(max_size, Image.ANTIALIAS)
-                img.save(self.photo.path)
+        # The report count is only saved when asked for in update_fields, as update_report_count keeps it up to date
+        # with UPDATEs and the count this instance was loaded with may have changed since
+        if not self._state.adding and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name != 'report_count']
+        # Call the parent save() method to save the object as usual,
+        # updating the owner's points in the same transaction if the status changed
+        with transaction.atomic():
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'status' not in update_fields:
+                # The status is not saved, so the points do not change
+                self._loaded_status = self.status
+            elif self.pk is not None and not self._state.adding:
+                # Read the status again with the row locked, so concurrent saves, e.g. a Gamekeeper approving
+                # while the AI completes the task, change the points once between them
+                self._loaded_status = TaskInstance.objects.select_for_update().filter(pk=self.pk).values_list(
+                    'status', flat=True).first()
+            super().save(*args, **kwargs)
+            if self.status != self._loaded_status and \
+                    {self.status, self._loaded_status} & {self.COMPLETED, self.EXPLODED}:
+                points = self.points_value(self.status, self.task.points) - \
+                         self.points_value(self._loaded_status, self.task.points)
+                self.add_points({self.profile_id: points})
+
+            # Delete the variants of a replaced photo, which would otherwise be left behind
+            if self._loaded_photo and self._loaded_photo != (self.photo.name if self.photo else None):
+                storage, replaced = self.photo.storage, self._loaded_photo
+                transaction.on_commit(lambda: delete_variants(storage, replaced))
+
+            # Resize and rotate a new photo in the background once it is saved, so the request is not held up
+            if self.photo and self.photo.name != self._loaded_photo:
+                from tasks.tasks import process_task_photo
+                photo_name = self.photo.name
+                transaction.on_commit(lambda: process_task_photo.delay(self.pk, photo_name))
+        self._loaded_status = self.status
+        self._loaded_photo = self.photo.name if self.photo else None
 
     def report_task_complete(self):
         """
@@ -343,3 +455,196 @@ class TaskInstance(models.Model):
         """
         self.status = self.PENDING_APPROVAL
         self.time_completed = timezone.now()
+
+    def like(self, profile):
+        """
+        Like the task instance, completing it once it has LIKES_TO_COMPLETE likes.
+        The like and the check are one transaction, and the status is set with a conditional UPDATE
+        rather than a save, so the photo is not processed again.
+
+        Args:
+            profile (Profile): The profile liking the task instance.
+
+        Returns:
+            int: The number of likes the task instance has.
+        """
+        likes = TaskInstance.likes.through.objects.filter(taskinstance=OuterRef('pk'))
+        with transaction.atomic():
+            # Lock the task instance so concurrent likes are counted one after another,
+            # otherwise two likes reaching the threshold together could each count the other as missing
+            TaskInstance.objects.select_for_update().filter(pk=self.pk).exists()
+            self.likes.add(profile)
+            # Only the request which reaches the threshold first completes the task and adds its points
+            completed = TaskInstance.objects.filter(pk=self.pk, status=self.PENDING_APPROVAL).alias(
+                like_count=count_rows(likes)).filter(like_count__gte=self.LIKES_TO_COMPLETE).update(
+                status=self.COMPLETED)
+            if completed:
+                self.add_points({self.profile_id: self.task.points})
+                self.status = self._loaded_status = self.COMPLETED
+        return self.likes.count()
+
+    def report(self, profile):
+        """
+        Report the task instance, adding it to the moderation queue.
+
+        Args:
+            profile (Profile): The profile reporting the task instance.
+
+        Returns:
+            int: The number of reports the task instance has.
+        """
+        # update_report_count keeps report_count up to date
+        self.reports.add(profile)
+        return self.report_count
+
+    @classmethod
+    def points_value(cls, status, points):
+        """
+        Return the points a task instance with this status is worth to its owner.
+        Completed tasks grant their points, exploded tasks subtract them, and anything else is worth nothing.
+
+        Args:
+            status (str): The status of the task instance.
+            points (int): The points of the task.
+
+        Returns:
+            int: The points the task instance is worth.
+        """
+        if status == cls.COMPLETED:
+            return points
+        elif status == cls.EXPLODED:
+            return -points
+        return 0
+
+    @classmethod
+    def points_sum(cls, path=''):
+        """
+        Return an aggregate of the points task instances are worth to their owner, for use in annotate().
+        Completed tasks add their points, exploded tasks subtract them, and profiles without tasks have 0 points.
+
+        Args:
+            path (str): The lookup from the model being annotated to TaskInstance, e.g. 'profile__taskinstance__'.
+
+        Returns:
+            Coalesce: The aggregate expression.
+        """
+        return Coalesce(Sum(Case(
+            When(**{f'{path}status': cls.COMPLETED}, then=F(f'{path}task__points')),
+            When(**{f'{path}status': cls.EXPLODED}, then=-F(f'{path}task__points')),
+            default=0,
+        )), 0)
+
+    @classmethod
+    def add_points(cls, points_by_profile):
+        """
+        Add points to the total of each profile with a single UPDATE.
+
+        Args:
+            points_by_profile (dict[int, int]): The points to add, keyed by profile id.
+        """
+        points_by_profile = {profile_id: points for profile_id, points in points_by_profile.items() if points}
+        if points_by_profile:
+            Profile.objects.filter(pk__in=points_by_profile).update(points=F('points') + Case(
+                *[When(pk=profile_id, then=Value(points)) for profile_id, points in points_by_profile.items()],
+                default=Value(0)))
+            points_changed.send(sender=cls, profile_ids=list(points_by_profile))
+
+    @classmethod
+    def bulk_set_status(cls, instances, status):
+        """
+        Set the status of many task instances with a single UPDATE, keeping their owners' points up to date.
+        No photos are reprocessed and no post_save signals are sent.
+
+        Args:
+            instances (QuerySet[TaskInstance]): The task instances to update.
+            status (str): The new status.
+
+        Returns:
+            int: The number of task instances updated.
+        """
+        with transaction.atomic():
+            rows = list(instances.exclude(status=status).select_for_update(of=('self',)).values_list(
+                'pk', 'profile_id', 'status', 'task__points'))
+            if not rows:
+                return 0
+
+            points_by_profile = {}
+            for pk, profile_id, old_status, points in rows:
+                points = cls.points_value(status, points) - cls.points_value(old_status, points)
+                points_by_profile[profile_id] = points_by_profile.get(profile_id, 0) + points
+
+            updated = cls.objects.filter(pk__in=[row[0] for row in rows]).update(status=status)
+            cls.add_points(points_by_profile)
+        return updated
+
+    @classmethod
+    def approve_expired(cls):
+        """
+        Approve every task which has been pending approval for longer than the approval period.
+
+        Returns:
+            int: The number of tasks approved.
+        """
+        expired = cls.objects.filter(status=cls.PENDING_APPROVAL,
+                                     time_completed__lt=timezone.now() - cls.APPROVAL_PERIOD)
+        return cls.bulk_set_status(expired, cls.COMPLETED)
+
+    @classmethod
+    def annotate_feed(cls, queryset, profile, reporters=False):
+        """
+        Annotate everything a feed card displays, so a page of the feed takes the same number of queries
+        however many task instances it shows.
+
+        Args:
+            queryset (QuerySet[TaskInstance]): The task instances in the feed.
+            profile (Profile): The profile viewing the feed.
+            reporters (bool): Whether to load who reported each task instance, which only staff are shown.
+
+        Returns:
+            QuerySet[TaskInstance]: The task instances, with like_count, liked_by_me, reported_by_me
+            and, if reporters is True, reporters (the profiles which reported it).
+        """
+        likes = cls.likes.through.objects.filter(taskinstance=OuterRef('pk'))
+        reports = cls.reports.through.objects.filter(taskinstance=OuterRef('pk'))
+        queryset = queryset.select_related('task', 'profile__user').annotate(
+            like_count=count_rows(likes),
+            liked_by_me=Exists(likes.filter(profile=profile)),
+            reported_by_me=Exists(reports.filter(profile=profile)),
+        )
+        if reporters:
+            queryset = queryset.prefetch_related(
+                Prefetch('reports', queryset=Profile.objects.select_related('user'), to_attr='reporters'))
+        return queryset
+
+    @classmethod
+    def update_report_counts(cls, ids):
+        """
+        Count the reports of task instances again, with a single UPDATE.
+
+        Args:
+            ids (Iterable[int]): The ids of the task instances.
+        """
+        reports = cls.reports.through.objects.filter(taskinstance=OuterRef('pk'))
+        cls.objects.filter(pk__in=ids).update(report_count=count_rows(reports))
+        transaction.on_commit(cls.invalidate_reported_count)
+
+    @classmethod
+    def get_reported_count(cls):
+        """
+        Return how many task instances have been reported at least once, shown to staff on every page.
+
+        Returns:
+            int: The number of reported task instances.
+        """
+        count = cache.get(REPORTED_COUNT_CACHE_KEY)
+        if count is None:
+            count = cls.objects.filter(report_count__gt=0).count()
+            cache.set(REPORTED_COUNT_CACHE_KEY, count, None)
+        return count
+
+    @classmethod
+    def invalidate_reported_count(cls):
+        """
+        Remove the cached number of reported task instances, after reports change or a reported task is deleted.
+        """
+        cache.delete(REPORTED_COUNT_CACHE_KEY)
@@ -1,10 +1,11 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete
 from django.dispatch import receiver
 from django.urls import reverse
-from notifications.signals import notify
 
-from tasks.models import TaskInstance
-from accounts.models import User
+from accounts import dispatch
+from friends.models import Profile
+from tasks.models import Task, TaskInstance
 
 
 @receiver(post_save, sender=TaskInstance)
@@ -13,6 +14,67 @@ def send_tag_notification(sender, instance, created, **kwargs):
     Send user a notification when they have been tagged in a task.
     Applicable when another user or Steve tagged.
     """
-    if 'tagged you' in instance.origin_message:
-        notify.send(instance.profile, recipient=instance.profile.user, verb=': You have been tagged!',
-                    action_object=instance, target=instance.task, url=reverse('tasks:list'), public=False)
+    if created and 'tagged you' in instance.origin_message:
+        dispatch.send(instance.profile, [instance.profile.user_id], ': You have been tagged!',
+                      action_object=instance, target=instance.task, url=reverse('tasks:list'))
+
+
+def send_tag_notifications(instances, user_ids):
+    """
+    Send the notifications of send_tag_notification for task instances created with bulk_create,
+    which does not send post_save, with one INSERT once the transaction commits.
+
+    Args:
+        instances (list[TaskInstance]): The saved task instances.
+        user_ids (dict[int, int]): Maps the id of each instance's profile to the id of its user.
+    """
+    url = reverse('tasks:list')
+    dispatch.send_many([
+        dispatch.notification(Profile(pk=instance.profile_id), [user_ids[instance.profile_id]],
+                              ': You have been tagged!', action_object=instance, target=Task(pk=instance.task_id),
+                              url=url)
+        for instance in instances if 'tagged you' in instance.origin_message
+    ])
+
+
+@receiver(post_delete, sender=TaskInstance)
+def remove_task_points(sender, instance, **kwargs):
+    """
+    Remove the points a deleted task instance was worth from its owner's total,
+    and remove it from the count of reported tasks if it was reported.
+    """
+    if instance.report_count:
+        transaction.on_commit(TaskInstance.invalidate_reported_count)
+    if instance._loaded_status in [TaskInstance.COMPLETED, TaskInstance.EXPLODED]:
+        points = TaskInstance.points_value(instance._loaded_status, instance.task.points)
+        TaskInstance.add_points({instance.profile_id: -points})
+
+
+@receiver(m2m_changed, sender=TaskInstance.reports.through)
+def update_report_count(sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep the report count of task instances up to date when reports are added or removed,
+    from either the task instance or the profile.
+    """
+    if action == 'pre_clear' and reverse:
+        # The task instances a profile reported are only known before its reports are cleared
+        instance._cleared_report_ids = list(instance.reports.values_list('pk', flat=True))
+    elif action in ['post_add', 'post_remove', 'post_clear']:
+        if not reverse:
+            TaskInstance.update_report_counts([instance.pk])
+            instance.refresh_from_db(fields=['report_count'])
+        elif action == 'post_clear':
+            TaskInstance.update_report_counts(instance.__dict__.pop('_cleared_report_ids', []))
+        else:
+            TaskInstance.update_report_counts(pk_set)
+
+
+@receiver(pre_delete, sender=Profile)
+def update_report_counts_of_deleted_profile(sender, instance, **kwargs):
+    """
+    Count the reports of the task instances a profile reported again once it is deleted,
+    as deleting the profile deletes its reports without sending m2m_changed.
+    """
+    ids = list(instance.reports.values_list('pk', flat=True))
+    if ids:
+        transaction.on_commit(lambda: TaskInstance.update_report_counts(ids))
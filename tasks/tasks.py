@@ -1,5 +1,20 @@
+import os
+import stat
+import tempfile
+
 from celery import shared_task
+from PIL import ExifTags, Image, ImageOps
+
 from tasks.management.commands.assigntasks import Command as AssignTask
+from tasks.geocoding import reverse_geocode
+from tasks.images import generate_variants
+from tasks.models import TaskInstance
+
+# Photos are resized to fit within this size
+PHOTO_MAX_SIZE = (800, 800)
+
+# The variants shown in feed cards and on task detail pages
+TASK_PHOTO_VARIANTS = ['card', 'full']
 
 
 @shared_task(name="assign_tasks")
@@ -10,3 +25,95 @@ def assign_tasks():
     """
     AssignTask().handle()
     return None
+
+
+@shared_task(name="approve_tasks")
+def approve_tasks():
+    """
+    Celery task to approve tasks which have been pending approval for over a week, which is run every hour.
+    See sustainability/celery.py for more information.
+
+    Returns:
+        int: The number of tasks approved.
+    """
+    approved = TaskInstance.approve_expired()
+    print(f"Approved {approved} task(s) pending approval for over {TaskInstance.APPROVAL_PERIOD.days} days")
+    return approved
+
+
+def save_replacing(img, path, image_format):
+    """
+    Save an image over a file, writing it to a temporary file next to it first and then moving it into place,
+    so anything reading the file at the same time, e.g. the AI classifying the photo, sees the old or new image whole.
+
+    Args:
+        img (Image): The image to save.
+        path (str): The path of the file to replace.
+        image_format (str): The format to save the image in, e.g. 'JPEG'.
+    """
+    directory, filename = os.path.split(path)
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix=f'.{filename}.')
+    try:
+        with os.fdopen(descriptor, 'wb') as temporary:
+            if image_format == 'JPEG':
+                img.save(temporary, format=image_format, quality=85, optimize=True)
+            else:
+                img.save(temporary, format=image_format)
+        # mkstemp only lets the owner read the file, keep the permissions of the photo it replaces
+        os.chmod(temporary_path, stat.S_IMODE(os.stat(path).st_mode))
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+@shared_task(name="process_task_photo")
+def process_task_photo(task_instance_id, photo_name):
+    """
+    Celery task to rotate a task instance's new photo upright, shrink it to fit PHOTO_MAX_SIZE,
+    and generate its card and full size variants, which is queued when a new photo is saved.
+    The photo is skipped if it has been replaced or deleted since.
+
+    Args:
+        task_instance_id (int): The id of the task instance.
+        photo_name (str): The name of the photo when it was saved.
+
+    Returns:
+        bool: Whether the photo was processed.
+    """
+    task_instance = TaskInstance.objects.filter(pk=task_instance_id).only('photo').first()
+    if task_instance is None or task_instance.photo.name != photo_name:
+        return False
+
+    with Image.open(task_instance.photo.path) as img:
+        image_format = img.format
+        # Only rewrite photos which are not already upright and small enough
+        upright = img.getexif().get(ExifTags.Base.Orientation, 1) == 1
+        if not upright or img.width > PHOTO_MAX_SIZE[0] or img.height > PHOTO_MAX_SIZE[1]:
+            img = ImageOps.exif_transpose(img)
+            img.thumbnail(PHOTO_MAX_SIZE, Image.LANCZOS)
+            save_replacing(img, task_instance.photo.path, image_format)
+
+    generate_variants(task_instance.photo, TASK_PHOTO_VARIANTS)
+    return True
+
+
+# Nominatim allows at most one request a second
+@shared_task(name="geocode_task_instance", rate_limit="1/s")
+def geocode_task_instance(task_instance_id, latitude, longitude):
+    """
+    Celery task to find the address where a task was completed from the coordinates the user shared,
+    which is queued when the user completes the task.
+
+    Args:
+        task_instance_id (int): The id of the task instance.
+        latitude (float): The latitude.
+        longitude (float): The longitude.
+
+    Returns:
+        str: The address, or None if there is no address there.
+    """
+    location = reverse_geocode(latitude, longitude)
+    if location is not None:
+        TaskInstance.objects.filter(pk=task_instance_id).update(location=location)
+    return location
@@ -0,0 +1,28 @@
+from django import template
+
+from tasks.images import has_variant, variant_name
+
+register = template.Library()
+
+
+@register.inclusion_tag('components/picture.html')
+def picture(field_file, variant, alt='', **attrs):
+    """
+    Show a variant of an image using a django template tag, as WebP with a JPEG fallback.
+    The original image is shown if the variant has not been generated yet.
+
+    Args:
+        field_file (FieldFile): The original image, e.g. task.photo or profile.image.
+        variant (str): The variant, one of tasks.images.VARIANT_SIZES.
+        alt (str): The alternative text of the image.
+        attrs: Other attributes of the img element, e.g. class, width and height.
+
+    Returns:
+        dict[str, Any]: The urls of the variant, or of the original image, and the img attributes.
+    """
+    context = {'src': field_file.url, 'webp': None, 'alt': alt, 'attrs': attrs}
+    if has_variant(field_file, variant):
+        storage = field_file.storage
+        context['src'] = storage.url(variant_name(field_file.name, variant, 'jpg'))
+        context['webp'] = storage.url(variant_name(field_file.name, variant, 'webp'))
+    return context
@@ -1,7 +1,24 @@
-from django.test import TestCase
+import os
+import random
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import ExifTags, Image
 from tasks.tests.factories import TaskFactory, TaskInstanceFactory
+from friends.forms import UpdateProfileForm
 from friends.tests.factories import ProfileFactory
 from tasks.models import *
+from tasks.geocoding import KDTree, geocode_cache_key, reverse_geocode
+from tasks.images import generate_variants, has_variant, variant_name
+from tasks.tasks import geocode_task_instance, process_task_photo
+from tasks.templatetags.image_variants import picture
+from tasks.templatetags.poll_extras import get_reported_count
 from datetime import timedelta
 
 
@@ -66,6 +83,17 @@ class TaskAvailability(TestCase):
         self.assertIn(task_B, available_tasks)
         self.assertIn(task_C, available_tasks)
 
+    def test_get_available_single_query(self):
+        """Verify that the availability of every task is checked in one query."""
+        profile = ProfileFactory.create()
+        task_A = Task.objects.get(title="A")
+        TaskInstanceFactory.create(task=task_A, profile=profile)
+
+        tasks = list(Task.objects.all())
+        with self.assertNumQueries(1):
+            available_tasks = Task.get_available(profile, tasks)
+        self.assertEqual(available_tasks, [task for task in tasks if task != task_A])
+
 
 class TaskInstanceInvalidValues(TestCase):
     def test_time_complete_status_active(self):
@@ -95,3 +123,350 @@ class TaskInstanceInvalidValues(TestCase):
 
         instance.time_completed = timezone.now() + datetime.timedelta(hours=1)
         self.assertRaises(ValidationError, instance.clean)
+
+
+class TaskInstanceApproval(TestCase):
+
+    def test_approve_expired(self):
+        """Verify that only tasks pending approval for over a week are approved."""
+        now = timezone.now()
+        expired = TaskInstanceFactory.create(status=TaskInstance.PENDING_APPROVAL,
+                                             time_completed=now - timedelta(days=8))
+        recent = TaskInstanceFactory.create(status=TaskInstance.PENDING_APPROVAL,
+                                            time_completed=now - timedelta(days=6))
+        active = TaskInstanceFactory.create()
+
+        self.assertEqual(TaskInstance.approve_expired(), 1)
+
+        expired.refresh_from_db()
+        recent.refresh_from_db()
+        active.refresh_from_db()
+        self.assertEqual(expired.status, TaskInstance.COMPLETED)
+        self.assertEqual(recent.status, TaskInstance.PENDING_APPROVAL)
+        self.assertEqual(active.status, TaskInstance.ACTIVE)
+
+
+class ProfilePoints(TestCase):
+
+    def setUp(self):
+        self.profile = ProfileFactory.create()
+        self.task = TaskFactory.create(points=10)
+
+    def assertPoints(self, points):
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.points, points)
+
+    def test_points_follow_status(self):
+        """Verify that completing a task grants its points and exploding a task subtracts them."""
+        instance = TaskInstanceFactory.create(task=self.task, profile=self.profile)
+        self.assertPoints(0)
+
+        instance.report_task_complete()
+        instance.save()
+        self.assertPoints(0)
+
+        instance.status = TaskInstance.COMPLETED
+        instance.save()
+        self.assertPoints(10)
+
+        # Saving without changing status does not grant the points again
+        instance.save()
+        self.assertPoints(10)
+
+        TaskInstanceFactory.create(task=self.task, profile=self.profile, status=TaskInstance.EXPLODED)
+        self.assertPoints(0)
+
+    def test_stale_instances_grant_points_once(self):
+        """Verify that two copies of a task loaded before either completed it only grant its points once."""
+        instance = TaskInstanceFactory.create(task=self.task, profile=self.profile,
+                                              status=TaskInstance.PENDING_APPROVAL, time_completed=timezone.now())
+        first, second = TaskInstance.objects.get(pk=instance.pk), TaskInstance.objects.get(pk=instance.pk)
+        for copy in (first, second):
+            copy.status = TaskInstance.COMPLETED
+            copy.save()
+        self.assertPoints(10)
+
+    def test_deleting_task_removes_points(self):
+        """Verify that deleting a completed task removes its points."""
+        instance = TaskInstanceFactory.create(task=self.task, profile=self.profile, status=TaskInstance.COMPLETED,
+                                              time_completed=timezone.now())
+        self.assertPoints(10)
+        TaskInstance.objects.get(pk=instance.pk).delete()
+        self.assertPoints(0)
+
+    def test_approve_expired_grants_points(self):
+        """Verify that tasks approved in bulk grant their points."""
+        TaskInstanceFactory.create_batch(2, task=self.task, profile=self.profile,
+                                         status=TaskInstance.PENDING_APPROVAL,
+                                         time_completed=timezone.now() - timedelta(days=8))
+        self.assertPoints(0)
+        TaskInstance.approve_expired()
+        self.assertPoints(20)
+
+    def test_rebuild_points(self):
+        """Verify that rebuildpoints restores points changed outside of Django."""
+        TaskInstanceFactory.create(task=self.task, profile=self.profile, status=TaskInstance.COMPLETED,
+                                   time_completed=timezone.now())
+        Profile.objects.filter(pk=self.profile.pk).update(points=0)
+        TaskInstance.objects.filter(profile=self.profile).update(status=TaskInstance.EXPLODED)
+
+        call_command('rebuildpoints', chunk_size=1, stdout=StringIO())
+        self.assertPoints(-10)
+
+    def test_saving_profile_keeps_points(self):
+        """Verify that saving a profile loaded before its points changed does not overwrite them."""
+        profile = Profile.objects.get(pk=self.profile.pk)
+        TaskInstanceFactory.create(task=self.task, profile=self.profile, status=TaskInstance.COMPLETED,
+                                   time_completed=timezone.now())
+        profile.bio = 'Recycling'
+        profile.save()
+        self.assertPoints(10)
+
+
+class TaskAssignment(TestCase):
+
+    def setUp(self):
+        self.tasks = [TaskFactory(time_to_repeat=timedelta(days=1)) for i in range(3)]
+        self.profile = ProfileFactory()
+
+    def test_unavailable_ids(self):
+        """Verify that active and recently completed tasks are unavailable until a newer instance explodes."""
+        now = timezone.now()
+        TaskInstanceFactory(task=self.tasks[0], profile=self.profile, status=TaskInstance.ACTIVE)
+        TaskInstanceFactory(task=self.tasks[1], profile=self.profile, status=TaskInstance.COMPLETED,
+                            time_accepted=now - timedelta(hours=3), time_completed=now - timedelta(hours=2))
+        TaskInstanceFactory(task=self.tasks[2], profile=self.profile, status=TaskInstance.COMPLETED,
+                            time_accepted=now - timedelta(hours=3), time_completed=now - timedelta(hours=2))
+        TaskInstanceFactory(task=self.tasks[2], profile=self.profile, status=TaskInstance.EXPLODED,
+                            time_accepted=now - timedelta(hours=1))
+
+        unavailable = Task.get_unavailable_ids()
+        self.assertEqual(unavailable, {self.profile.id: {self.tasks[0].id, self.tasks[1].id}})
+        for task in self.tasks:
+            self.assertEqual(task.is_available(self.profile), task.id not in unavailable[self.profile.id])
+
+    def test_assigns_available_task(self):
+        """Verify that the only available task is assigned, and the user is notified."""
+        for task in self.tasks[:2]:
+            TaskInstanceFactory(task=task, profile=self.profile, status=TaskInstance.ACTIVE)
+
+        # Notifications are written once the transaction commits
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('assigntasks', stdout=StringIO())
+        assigned = TaskInstance.objects.get(profile=self.profile, tagged_by='SusSteve')
+        self.assertEqual(assigned.task, self.tasks[2])
+        self.assertEqual(self.profile.user.notifications.get().action_object, assigned)
+
+    def test_skips_users_with_too_many_active_tasks(self):
+        """Verify that users with more than five active tasks are not assigned another."""
+        for i in range(6):
+            TaskInstanceFactory(profile=self.profile, status=TaskInstance.ACTIVE)
+
+        call_command('assigntasks', stdout=StringIO())
+        self.assertFalse(TaskInstance.objects.filter(profile=self.profile, tagged_by='SusSteve').exists())
+
+
+class TaskPhotoProcessing(TestCase):
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.addCleanup(shutil.rmtree, self.media_root)
+        cache.clear()
+        self.task_instance = TaskInstanceFactory()
+
+    def upload_photo(self, size, orientation=1):
+        exif = Image.Exif()
+        exif[ExifTags.Base.Orientation] = orientation
+        photo = BytesIO()
+        Image.new('RGB', size).save(photo, format='JPEG', exif=exif)
+        return SimpleUploadedFile('photo.jpg', photo.getvalue(), content_type='image/jpeg')
+
+    def test_processing_queued_only_for_new_photo(self):
+        """Verify that saving a task instance only queues photo processing when the photo has changed."""
+        self.task_instance.photo = self.upload_photo((100, 100))
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.task_instance.save()
+        self.assertEqual(len(callbacks), 1)
+
+        task_instance = TaskInstance.objects.get(pk=self.task_instance.pk)
+        with self.captureOnCommitCallbacks() as callbacks:
+            task_instance.save()
+        self.assertEqual(len(callbacks), 0)
+
+    def test_photo_rotated_and_resized(self):
+        """Verify that a large sideways photo is rotated upright and resized to fit 800x800."""
+        self.task_instance.photo = self.upload_photo((1600, 1000), orientation=6)
+        self.task_instance.save()
+
+        self.assertTrue(process_task_photo(self.task_instance.pk, self.task_instance.photo.name))
+        with Image.open(self.task_instance.photo.path) as img:
+            self.assertEqual(img.size, (500, 800))
+
+    def test_photo_replaced_whole(self):
+        """Verify that a photo being read while it is processed is read whole, and no temporary files are left."""
+        self.task_instance.photo = self.upload_photo((1600, 1000))
+        self.task_instance.save()
+        path = self.task_instance.photo.path
+        mode = os.stat(path).st_mode
+
+        with open(path, 'rb', buffering=0) as reader:
+            original = reader.read(10)
+            process_task_photo(self.task_instance.pk, self.task_instance.photo.name)
+            original += reader.read()
+        with Image.open(BytesIO(original)) as img:
+            self.assertEqual(img.size, (1600, 1000))
+        with Image.open(path) as img:
+            self.assertEqual(img.size, (800, 500))
+        self.assertEqual(os.stat(path).st_mode, mode)
+        self.assertFalse([name for name in os.listdir(os.path.dirname(path)) if name.startswith('.')])
+
+    def test_replaced_photo_skipped(self):
+        """Verify that a photo which has been replaced since it was queued is not processed."""
+        self.task_instance.photo = self.upload_photo((1600, 1000))
+        self.task_instance.save()
+        self.assertFalse(process_task_photo(self.task_instance.pk, 'task_photos/old.jpg'))
+
+    def test_variants_shown_once_generated(self):
+        """Verify that the original photo is shown until its variants are generated, then the card variant is."""
+        self.task_instance.photo = self.upload_photo((1600, 1000))
+        self.task_instance.save()
+        photo = self.task_instance.photo
+        self.assertEqual(picture(photo, 'card'), {'src': photo.url, 'webp': None, 'alt': '', 'attrs': {}})
+
+        cache.clear()
+        process_task_photo(self.task_instance.pk, photo.name)
+        context = picture(photo, 'card')
+        self.assertEqual(context['src'], photo.storage.url(variant_name(photo.name, 'card', 'jpg')))
+        self.assertEqual(context['webp'], photo.storage.url(variant_name(photo.name, 'card', 'webp')))
+        with Image.open(photo.storage.path(variant_name(photo.name, 'card', 'webp'))) as img:
+            self.assertEqual(img.size, (480, 300))
+
+    def test_replaced_image_variants_deleted(self):
+        """Verify that replacing a profile image with one of another extension deletes the old image's variants,
+        rather than showing them in place of the new image."""
+        self.assertNotEqual(variant_name('profile_pics/alice.jpg', 'card', 'jpg'),
+                            variant_name('profile_pics/alice.png', 'card', 'jpg'))
+        def upload(profile, name):
+            form = UpdateProfileForm(data={'bio': ''}, files={'image': SimpleUploadedFile(
+                name, self.upload_photo((200, 200)).read())}, instance=profile)
+            self.assertTrue(form.is_valid())
+            with self.captureOnCommitCallbacks() as callbacks:
+                return form.save(), callbacks
+
+        profile, callbacks = upload(ProfileFactory(), 'old.jpg')
+        old = profile.image
+        generate_variants(old, ['card'])
+        self.assertTrue(has_variant(old, 'card'))
+
+        profile, callbacks = upload(profile, 'new.png')
+        self.assertEqual(os.path.splitext(profile.image.name)[0], os.path.splitext(old.name)[0])
+        # The first deletes the replaced image's variants, the second queues generating the new image's
+        self.assertEqual(len(callbacks), 2)
+        callbacks[0]()
+
+        self.assertFalse(old.storage.exists(variant_name(old.name, 'card', 'jpg')))
+        self.assertFalse(has_variant(old, 'card'))
+        self.assertEqual(picture(profile.image, 'card')['src'], profile.image.url)
+
+
+@override_settings(GEOCODER_BACKEND='tasks.geocoding.OfflineGeocoder')
+class ReverseGeocoding(TestCase):
+
+    def setUp(self):
+        cache.clear()
+
+    def test_nearby_points_share_cached_address(self):
+        """Verify that points within the same rounded bucket are looked up once."""
+        self.assertEqual(reverse_geocode(50.73612, -3.53421), '50.736, -3.534')
+        # Replace the cached address, so a nearby point can only return it from the cache
+        cache.set(geocode_cache_key(50.73612, -3.53421), 'Exeter')
+        self.assertEqual(reverse_geocode(50.73588, -3.53379), 'Exeter')
+        self.assertEqual(reverse_geocode(50.7, -3.5), '50.700, -3.500')
+
+    def test_geocode_task_instance_sets_location(self):
+        """Verify that the background task saves the address on the task instance."""
+        task_instance = TaskInstanceFactory(location=None)
+        geocode_task_instance(task_instance.pk, 50.7361, -3.5342)
+        task_instance.refresh_from_db()
+        self.assertEqual(task_instance.location, '50.736, -3.534')
+
+
+@override_settings(GEOCODER_BACKEND='tasks.geocoding.GazetteerGeocoder')
+class GazetteerGeocoding(TestCase):
+
+    def test_nearest_matches_brute_force(self):
+        """Verify that the k-d tree finds the same nearest point as checking every point."""
+        rng = random.Random(0)
+        points = [(rng.random(), rng.random(), rng.random()) for _ in range(200)]
+        tree = KDTree(points)
+        for _ in range(50):
+            point = (rng.random(), rng.random(), rng.random())
+            expected = min(range(len(points)), key=lambda i: sum((a - b) ** 2 for a, b in zip(point, points[i])))
+            self.assertEqual(tree.nearest(point)[0], expected)
+
+    def test_reverse_finds_nearest_place(self):
+        """Verify that points resolve to the nearest place in the gazetteer, unless they are far from every place."""
+        self.assertEqual(reverse_geocode(50.7352, -3.5361), 'Streatham Campus, Exeter, Devon')
+        self.assertEqual(reverse_geocode(51.46, -2.6), 'Bristol, England')
+        # The middle of the Atlantic Ocean
+        self.assertIsNone(reverse_geocode(45.0, -30.0))
+
+
+class ReportCount(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.task_instance = TaskInstanceFactory()
+        self.reporters = ProfileFactory.create_batch(2)
+
+    def test_report_count_follows_reports(self):
+        """Verify that the report count is kept up to date when reports are added or removed from either side."""
+        self.assertEqual(get_reported_count(), 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task_instance.reports.add(*self.reporters)
+        self.assertEqual(self.task_instance.report_count, 2)
+        self.assertEqual(get_reported_count(), 1)
+
+        self.reporters[0].reports.clear()
+        self.task_instance.refresh_from_db()
+        self.assertEqual(self.task_instance.report_count, 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task_instance.reports.clear()
+        self.assertEqual(self.task_instance.report_count, 0)
+        self.assertEqual(get_reported_count(), 0)
+
+    def test_deleting_reporter_removes_reports(self):
+        """Verify that deleting a profile which reported a task removes its report from the count."""
+        with self.captureOnCommitCallbacks(execute=True):
+            self.task_instance.reports.add(self.reporters[0])
+        self.assertEqual(get_reported_count(), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.reporters[0].user.delete()
+        self.task_instance.refresh_from_db()
+        self.assertEqual(self.task_instance.report_count, 0)
+        self.assertEqual(get_reported_count(), 0)
+
+    def test_saving_task_keeps_report_count(self):
+        """Verify that saving a task instance loaded before it was reported does not overwrite its report count."""
+        task_instance = TaskInstance.objects.get(pk=self.task_instance.pk)
+        self.task_instance.reports.add(self.reporters[0])
+        task_instance.save()
+        self.task_instance.refresh_from_db()
+        self.assertEqual(self.task_instance.report_count, 1)
+
+    def test_restore_clears_reports(self):
+        """Verify that restoring a reported task removes it from the moderation queue."""
+        self.task_instance.reports.add(*self.reporters)
+        staff = ProfileFactory(user__is_staff=True)
+        self.client.force_login(staff.user)
+
+        self.client.post(reverse('feed:restore', args=[self.task_instance.pk]))
+
+        self.task_instance.refresh_from_db()
+        self.assertEqual(self.task_instance.report_count, 0)
+        self.assertEqual(self.task_instance.status, TaskInstance.COMPLETED)
@@ -74,8 +74,7 @@ class IndexView(LoginRequiredMixin, TemplateView):
 
         # Generate a list of all tasks that are available for this user
         current_profile = self.request.user.profile
-        tasks_list = [task for task in Task.objects.all() if task.is_available(current_profile)
-                      and task.can_user_self_assign]
+        tasks_list = Task.get_available(current_profile, Task.objects.filter(can_user_self_assign=True))
         context['tasks_list'] = tasks_list
         return context
 
@@ -175,6 +174,11 @@ class SendTagView(LoginRequiredMixin, View):
         # get the friend's profile
         profile = get_object_or_404(Profile, user__username=request.POST['username'])
 
+        # only friends can be tagged
+        if profile.id not in request.user.profile.get_friend_ids():
+            messages.error(request, 'You can only tag your friends.')
+            return redirect('tasks:list')
+
         # get the task instance
         task_instance_sent = TaskInstance.objects.get(pk=self.kwargs['pk'])
 
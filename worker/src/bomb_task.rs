@@ -127,17 +127,27 @@ pub async fn process_bomb_tasks(pool: &PgPool) -> Result<(), Box<dyn std::error:
 
         for bomb_task in bomb_tasks {
             if bomb_task.time_left() < Duration::seconds(0) {
+                // Explode the task and subtract its points from the owner in one statement,
+                // keeping friends_profile.points in step with the points Django keeps as tasks change status
                 sqlx::query!(
                     r#"
-                    UPDATE tasks_taskinstance
-                    SET status = 'EXPLODED'
-                    WHERE task_id = (
-                        SELECT id FROM tasks_task WHERE title = $1
-                    ) AND profile_id = (
-                        SELECT id FROM friends_profile WHERE user_id = (
-                            SELECT id FROM accounts_user WHERE email = $2
+                    WITH exploded AS (
+                        UPDATE tasks_taskinstance ti
+                        SET status = 'EXPLODED'
+                        FROM tasks_task t
+                        WHERE ti.task_id = t.id AND t.title = $1 AND ti.status = 'ACTIVE' AND ti.profile_id = (
+                            SELECT id FROM friends_profile WHERE user_id = (
+                                SELECT id FROM accounts_user WHERE email = $2
+                            )
                         )
+                        RETURNING ti.profile_id, t.points
                     )
+                    UPDATE friends_profile
+                    SET points = friends_profile.points - lost.points
+                    FROM (
+                        SELECT profile_id, SUM(points) AS points FROM exploded GROUP BY profile_id
+                    ) lost
+                    WHERE friends_profile.id = lost.profile_id
                     "#,
                     bomb_task.task_title,
                     bomb_task.assigned_email,